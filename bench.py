@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+'''
+Usage: python3 bench.py [benchmark ...]
+
+    Run the named benchmarks (default: all) and print timings.
+'''
+
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from unittest.mock import patch
+
+from xdplayer import Crossword, CrosswordPlayer, opt
+from xdplayer.headless import HeadlessScreen
+from xdplayer.numbering import number_grid
+
+sizes = [(15, 15), (50, 50), (100, 100)]
+
+
+def timeit(label, func, *args, mintime=0.5):
+    'Call func(*args) repeatedly for at least *mintime* seconds and print the mean time per call.'
+    n = 0
+    t0 = time.perf_counter()
+    while True:
+        func(*args)
+        n += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed >= mintime:
+            break
+    print('%-40s %10.3f ms  (%d runs)' % (label, elapsed*1000/n, n))
+    return elapsed/n
+
+
+def synthetic_rows(nrows, ncols, seed=0):
+    'Return rows of a random filled grid with rotationally symmetric blocks.'
+    rnd = random.Random(seed)
+    rows = [[rnd.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for c in range(ncols)] for r in range(nrows)]
+    for r in range(nrows):
+        for c in range(ncols):
+            if rnd.random() < 1/12:
+                rows[r][c] = rows[nrows-1-r][ncols-1-c] = '#'
+    return [''.join(row) for row in rows]
+
+
+def synthetic_xd(nrows, ncols, seed=0):
+    'Return the contents of a .xd file with a synthetic grid of the given size.'
+    rows = synthetic_rows(nrows, ncols, seed)
+    clues = {'A': [], 'D': []}
+    for dir, num, r, c, n in number_grid(rows):
+        if dir == 'A':
+            answer = rows[r][c:c+n]
+        else:
+            answer = ''.join(rows[r+i][c] for i in range(n))
+        clues[dir].append(f'{dir}{num}. Synthetic clue for {dir}{num} ~ {answer}')
+
+    return '\n\n\n'.join([
+        f'Title: Synthetic {ncols}x{nrows}\nAuthor: bench.py',
+        '\n'.join(rows),
+        '\n'.join(clues['A']) + '\n\n' + '\n'.join(clues['D']),
+    ]) + '\n'
+
+
+def synthetic_files(tmpdir):
+    'Write synthetic .xd files of each size into *tmpdir* and return their paths.'
+    paths = []
+    for nrows, ncols in sizes:
+        fn = os.path.join(tmpdir, f'synthetic{ncols}x{nrows}.xd')
+        with open(fn, 'w') as fp:
+            fp.write(synthetic_xd(nrows, ncols))
+        paths.append(fn)
+    return paths
+
+
+def bench_numbering():
+    for nrows, ncols in sizes:
+        rows = synthetic_rows(nrows, ncols)
+        timeit(f'number_grid {ncols}x{nrows}', number_grid, rows)
+
+
+def bench_load():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for fn in synthetic_files(tmpdir):
+            name = os.path.basename(fn)
+            with patch.dict(os.environ, XDCACHE=''):
+                timeit(f'Crossword {name} (no cache)', Crossword, fn)
+            with patch.dict(os.environ, XDCACHE=os.path.join(tmpdir, 'cache')):
+                timeit(f'Crossword {name} (warm cache)', Crossword, fn)
+
+
+def synthetic_guesses(xd, nusers=4, seed=0):
+    'Write a guesses log for *xd* with several solvers filling half the grid and leaving notes.'
+    rnd = random.Random(seed)
+    with open(xd.guessfn, 'w') as fp:
+        for y in range(xd.nrows):
+            for x in range(xd.ncols):
+                if xd.solution.get(y, x) != '#' and rnd.random() < 0.5:
+                    fp.write(json.dumps(dict(x=x, y=y, ch=xd.solution.get(y, x), user=f'solver{rnd.randrange(nusers)}')) + '\n')
+        for dirnum in xd.acrosses[:5]:
+            fp.write(json.dumps(dict(dirnum=dirnum, note='is this a pun?', user='solver0', time=0)) + '\n')
+
+
+draw_phases = ['draw_grid', 'draw_meta', 'draw_clue_panels', 'draw_notes', 'draw_solvers']
+
+
+def bench_frames(label, plyr, scr, func, phases, mintime=0.5):
+    'Call func() for at least *mintime* seconds, then print frames/sec and the time spent in each drawing phase per frame.'
+    phases.clear()
+    n = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < mintime:
+        func()
+        n += 1
+    elapsed = time.perf_counter() - t0
+    print('%-40s %10.3f ms  %8.0f frames/s' % (label, elapsed*1000/n, n/elapsed))
+    for name in draw_phases:
+        print('    %-36s %10.3f ms' % (name, phases[name]*1000/n))
+
+
+def bench_draw():
+    phases = defaultdict(float)  # method name -> total seconds
+
+    def timed(func):
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                phases[func.__name__] += time.perf_counter() - t0
+        return wrapper
+
+    with tempfile.TemporaryDirectory() as tmpdir, patch.dict(os.environ, TEAMDIR=tmpdir, XDCACHE=''):
+        paths = sorted(glob.glob('samples/*.xd')) + synthetic_files(tmpdir)[1:]
+        for fn in paths:
+            xd = Crossword(fn)
+            synthetic_guesses(xd)
+            xd.close()
+
+            scr = HeadlessScreen(max(40, xd.nrows//2), 160)
+            plyr = CrosswordPlayer([fn])
+            xd = plyr.xd
+            xd.cursor_y = xd.nrows//2
+
+            keys = ['KEY_RIGHT', 'KEY_DOWN', 'KEY_LEFT', 'KEY_UP']
+            def keystroke():
+                plyr.handle_key(scr, xd, keys[plyr.n % len(keys)])
+                plyr.draw(scr, xd)
+
+            def repaint():
+                xd.invalidate()
+                plyr.draw(scr, xd)
+
+            name = os.path.basename(fn)
+            with patch.object(opt, 'scr', scr, create=True), \
+                 patch.multiple(Crossword, **{name: timed(getattr(Crossword, name)) for name in draw_phases}):
+                plyr.draw(scr, xd)
+                bench_frames(f'draw {name} (full repaint)', plyr, scr, repaint, phases)
+                bench_frames(f'draw {name} (cursor move)', plyr, scr, keystroke, phases)
+            xd.close()
+
+
+def synthetic_ddw(nframes, nrows, seed=0):
+    'Return the contents of a .ddw animation with *nframes* frames of *nrows* text rows each.'
+    rnd = random.Random(seed)
+    lines = [json.dumps(dict(id=str(i), type='frame', text='', color='', tags=[], group='', duration_ms=50)) for i in range(nframes)]
+    for i in range(nframes):
+        for j in range(nrows):
+            lines.append(json.dumps(dict(frame=str(i), x=rnd.randrange(80), y=j, text=''.join(rnd.choice('*+. ') for k in range(20)), color='%d' % rnd.randrange(256), tags=[], group='')))
+    return '\n'.join(lines) + '\n'
+
+
+def bench_animation():
+    from xdplayer.ddwplay import Animation, animation_cache, load_animation
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for nframes, nrows in [(25, 2), (500, 20), (2000, 40)]:
+            fn = os.path.join(tmpdir, f'anim{nframes}x{nrows}.ddw')
+            with open(fn, 'w') as fp:
+                fp.write(synthetic_ddw(nframes, nrows))
+            def parse():
+                with open(fn) as fp:
+                    return Animation(fp)
+
+            name = os.path.basename(fn)
+            timeit(f'Animation {name} (parse)', parse)
+            load_animation(fn)
+            timeit(f'Animation {name} (cached)', load_animation, fn)
+            animation_cache.clear()
+
+
+def synthetic_puz(fn, nrows, ncols, seed=0, locked=False):
+    'Write a .puz file with a synthetic grid of the given size, circled cells, and optionally a scrambled solution.'
+    from xdplayer import puz
+    rows = synthetic_rows(nrows, ncols, seed)
+    p = puz.Puzzle()
+    p.width, p.height = ncols, nrows
+    p.solution = ''.join(rows).replace('#', puz.BLACKSQUARE)
+    p.fill = ''.join('.' if ch == '#' else '-' for ch in ''.join(rows))
+    p.title, p.author, p.copyright = f'Synthetic {ncols}x{nrows}', 'bench.py', '(c) nobody'
+    p.clues = [f'Synthetic clue for {dir}{num}' for dir, num, r, c, n in sorted(number_grid(rows), key=lambda e: (e.num, e.dir))]
+    p.notes = 'Generated for benchmarking.'
+    p.extensions[puz.Extensions.Markup] = bytes(puz.GridMarkup.Circled if i % 17 == 0 else 0 for i in range(nrows*ncols))
+    p._extensions_order.append(puz.Extensions.Markup)
+    if locked:
+        p.lock_solution(1234)
+    p.save(fn)
+
+
+def bench_puz():
+    'Load every .puz in $PUZDIR, or in a directory of synthetic ones, and print files/sec.'
+    from xdplayer import puz
+    from xdplayer.puz2xd import gen_xd
+    with tempfile.TemporaryDirectory() as tmpdir:
+        puzdir = os.getenv('PUZDIR')
+        if not puzdir:
+            puzdir = tmpdir
+            for i in range(200):
+                nrows, ncols = [(15, 15), (21, 21), (50, 50)][i % 3]
+                synthetic_puz(os.path.join(tmpdir, f'synthetic{i}.puz'), nrows, ncols, seed=i, locked=i % 4 == 0)
+        paths = sorted(glob.glob(os.path.join(puzdir, '**', '*.puz'), recursive=True))
+
+        def load_all():
+            for fn in paths:
+                p = puz.read(fn)
+                if p.is_solution_locked():
+                    p.unlock_solution(1234)
+
+        def convert_all():
+            for fn in paths:
+                for line in gen_xd(fn):
+                    pass
+
+        for label, func in [('puz.read', load_all), ('gen_xd', convert_all)]:
+            secs = timeit(f'{label} {len(paths)} files', func)
+            print('    %-36s %10.0f files/s' % ('', len(paths)/secs))
+
+        data = bytes(random.Random(0).randrange(256) for i in range(100000))
+        timeit('data_cksum 100 KB', puz.data_cksum, data)
+        solution = ''.join(synthetic_rows(50, 50)).replace('#', '')
+        timeit('scramble_string 50x50', puz.scramble_string, solution, 1234)
+
+
+startup_script = '''
+from xdplayer import CrosswordPlayer, opt
+from xdplayer.headless import HeadlessScreen
+scr = opt.scr = HeadlessScreen(25, 80)
+plyr = CrosswordPlayer(['samples/wsj110624.xd'])
+plyr.draw(scr, plyr.xd)
+'''
+
+
+def importtimes(module):
+    'Return [(self us, cumulative us, name)] for each module imported by a fresh interpreter importing *module*, as reported by -X importtime.'
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True, check=True).stderr
+    times = []
+    for line in out.splitlines():
+        selfus, cumus, name = line.split(':', 1)[1].split('|')
+        if selfus.strip().isdigit():
+            times.append((int(selfus), int(cumus), name.strip()))
+    return times
+
+
+def bench_startup():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(os.environ, TEAMDIR=tmpdir, XDCACHE=os.path.join(tmpdir, 'cache'))
+        timeit('python -c "import xdplayer"', subprocess.run, [sys.executable, '-c', 'import xdplayer'], mintime=2)
+        timeit('python: first frame of a puzzle', lambda: subprocess.run([sys.executable, '-c', startup_script], env=env, check=True), mintime=2)
+
+    times = importtimes('xdplayer')
+    print('%-40s %10.3f ms  (%d modules)' % ('import xdplayer (-X importtime)', times[-1][1]/1000, len(times)))
+    for selfus, cumus, name in sorted(times, reverse=True)[:10]:
+        print('    %-36s %10.3f ms' % (name, selfus/1000))
+
+
+benchmarks = dict(
+    numbering=bench_numbering,
+    load=bench_load,
+    draw=bench_draw,
+    animation=bench_animation,
+    startup=bench_startup,
+    puz=bench_puz,
+)
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or benchmarks:
+        benchmarks[name]()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+'''
+    Usage:  xdcompact.py <xdid.xd-guesses.jsonl ...>
+
+        Rewrite each guesses log with only the rows needed to replay the same
+        grid, per-cell last writer, solver colors and notes.
+        Only run it while nobody is playing those puzzles.
+'''
+
+import os
+import sys
+import json
+
+from xdplayer.atomicfile import atomic_write
+from xdplayer.guesslog import compact, checkpoint_fn
+
+
+def main_compact(fn):
+    with open(fn, encoding='utf-8') as fp:
+        rows = [json.loads(line) for line in fp if line.strip()]
+
+    newrows = compact(rows)
+
+    st = os.stat(fn)
+    with atomic_write(fn, 'w', encoding='utf-8') as fp:
+        for r in newrows:
+            fp.write(json.dumps(r) + '\n')
+        os.fchmod(fp.fileno(), st.st_mode)  # keep submitted logs read-only
+
+    try:
+        os.unlink(checkpoint_fn(fn))  # its offset no longer means anything
+    except FileNotFoundError:
+        pass
+
+    print(f'{fn}: {len(rows)} -> {len(newrows)} rows')
+
+
+if __name__ == '__main__':
+    if not sys.argv[1:]:
+        print(__doc__)
+    for fn in sys.argv[1:]:
+        main_compact(fn)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+'''
+    Usage:  xdconvert.py [--clear] [-j <jobs>] <dir|file.puz ...>
+
+        Convert each .puz file, and every .puz under each directory, into a
+        .xd alongside it, with one process per cpu (or <jobs>).  .xd files
+        newer than their .puz are skipped.  With --clear, the grids are
+        written unfilled, without the solution.
+'''
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from xdplayer.puz2xd import convert, xd_path
+
+batch_size = 1024  # files queued for the workers at a time
+
+def find_puz(paths):
+    'Generate the .puz files in *paths*, walking directories.'
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for fn in sorted(filenames):
+                if fn.lower().endswith('.puz'):
+                    yield os.path.join(dirpath, fn)
+
+
+def is_stale(puzfn):
+    'Return True if the .xd for *puzfn* is missing or older than it.'
+    try:
+        return os.stat(xd_path(puzfn)).st_mtime_ns < os.stat(puzfn).st_mtime_ns
+    except FileNotFoundError:
+        return True
+
+
+def convert_one(task):
+    'Convert in a worker process.  Return (puzfn, error message or None).'
+    puzfn, clear = task
+    try:
+        convert(puzfn, clear=clear)
+        return puzfn, None
+    except Exception as e:
+        return puzfn, f'{type(e).__name__}: {getattr(e, "message", "") or e}'
+
+
+def main_convert(args):
+    counts = dict(converted=0, failed=0, skipped=0)
+
+    def tasks():
+        for puzfn in find_puz(args.paths):
+            if args.force or is_stale(puzfn):
+                yield puzfn, args.clear
+            else:
+                counts['skipped'] += 1
+
+    # Pool reads all of an iterable into its queue at once, so the tree is
+    # walked here, a batch at a time, to bound what is queued.
+    t0 = time.time()
+    todo = tasks()
+    with Pool(args.jobs) as pool:
+        while True:
+            batch = list(itertools.islice(todo, batch_size))
+            if not batch:
+                break
+            for puzfn, err in pool.imap_unordered(convert_one, batch, chunksize=16):
+                if err:
+                    counts['failed'] += 1
+                    print(f'{puzfn}: {err}', file=sys.stderr)
+                else:
+                    counts['converted'] += 1
+    secs = time.time() - t0
+
+    n = counts['converted'] + counts['failed']
+    print('{converted} converted, {failed} failed, {skipped} up to date'.format(**counts) +
+          f' in {secs:.1f}s ({n/secs if secs else 0:.0f} files/s)')
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(usage=__doc__)
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--clear', action='store_true', help='write unfilled grids, without the solution')
+    parser.add_argument('--force', action='store_true', help='convert even if the .xd is up to date')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: one per cpu)')
+    sys.exit(main_convert(parser.parse_args()))
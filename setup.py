@@ -8,7 +8,7 @@ setup(name='xdplayer',
       version=__version__,
       description='play crosswords in the terminal',
       python_requires='>=3.8',
-      scripts=['bin/xdplayer'],
+      scripts=['bin/xdplayer', 'bin/xdcompact.py', 'bin/xdconvert.py'],
       py_modules=['xdplayer'],
       package_data={'xdplayer': ['ddw/completed.ddw']},
       include_package_data=True,
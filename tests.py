@@ -1,7 +1,15 @@
 #!/usr/bin/env python3
 
 from xdplayer import *
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
+from xdplayer.headless import HeadlessScreen
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+os.environ['XDCACHE'] = ''  # keep the tests out of ~/.cache/xdplayer; tests of the cache set their own
 
 class PlayerTest():
     def __init__(self):
@@ -78,5 +86,641 @@ def test_moves():
     t.report()
 
 
+def test_lazy_playlist():
+    plyr = CrosswordPlayer(["samples/wsj110624.xd", "samples/saulpw-008.xd", "samples/nonexistent.xd"]*10)
+    assert list(plyr.loaded) == ["samples/wsj110624.xd"]  # only the first puzzle is parsed
+
+    for i in range(len(plyr.crossword_paths)):
+        plyr.next_crossword()
+        assert len(plyr.loaded) <= plyr.max_loaded
+        assert plyr.xd.fn != "samples/nonexistent.xd"
+
+
+def test_compiled_cache():
+    with tempfile.TemporaryDirectory() as cachedir, patch.dict(os.environ, XDCACHE=cachedir):
+        cold = Crossword("samples/wsj110624.xd")
+        assert len(os.listdir(cachedir)) == 1
+
+        with patch.object(Crossword, 'load_xd', side_effect=AssertionError('cache miss')):
+            warm = Crossword("samples/wsj110624.xd")
+
+        assert warm.meta == cold.meta
+        assert warm.solution == cold.solution
+        assert warm.clues == cold.clues
+        assert dict(warm.cross) == dict(cold.cross)
+        assert (warm.acrosses, warm.downs) == (cold.acrosses, cold.downs)
+
+        # a different size or mtime invalidates the entry
+        key = xdcache.sourcekey("samples/wsj110624.xd")
+        assert xdcache.load("samples/wsj110624.xd", key)
+        assert not xdcache.load("samples/wsj110624.xd", (key[0], key[1]+1))
+
+    # the cache is listed only when its running total may have passed the limit
+    with tempfile.TemporaryDirectory() as cachedir, patch.dict(os.environ, XDCACHE=cachedir):
+        d = xdcache.cachedir()
+        with patch.object(xdcache, 'prune', wraps=xdcache.prune) as prune:
+            for i in range(5):
+                xdcache.save(f'puzzle{i}.xd', (0, i), 'x'*1000)
+            assert prune.call_count == 1  # the first save in this process
+            with patch.dict(os.environ, XDCACHE_SIZE='3000'):
+                xdcache.save('puzzle5.xd', (0, 5), 'x'*1000)
+            assert prune.call_count == 2
+        assert len(os.listdir(cachedir)) == 2
+        assert xdcache.cache_totals[d] == sum(os.path.getsize(os.path.join(cachedir, fn)) for fn in os.listdir(cachedir))
+
+
+def test_solve_counters():
+    import random
+    xd = Crossword("samples/saulpw-008.xd")
+    cells = [(x, y) for y, row in enumerate(xd.solution) for x, ch in enumerate(row) if ch != '#']
+    rnd = random.Random(8)
+    for i in range(500):
+        x, y = rnd.choice(cells)
+        ch = rnd.choice([UNFILLED, xd.solution[y][x], xd.solution[y][x].lower(), 'Q', 'HEART'])
+        xd.replay_guess(dict(x=x, y=y, ch=ch, user=rnd.choice(['tester', 'teammate', 'other'])))
+
+        assert xd.ncells == len([c for r in xd.grid for c in r if c != '#'])
+        assert xd.nsolved == len([c for r in xd.grid for c in r if c not in '.#'])
+        assert xd.grade() == sum(1 for y, r in enumerate(xd.grid) for x, c in enumerate(r) if c != '#' and c.upper() == xd.solution[y][x].upper())
+        filled = {user: sum(1 for (x, y), r in xd.guesser.items() if r.get('user', '') == user and xd.cell(y, x) != UNFILLED) for user in xd.guessercolors}
+        assert {user: xd.nfilled[user] for user in filled} == filled
+
+    ckpt = xd.checkpoint()
+    nfilled = dict(xd.nfilled)
+    xd.reset_guesses()
+    xd.restore_checkpoint(json.loads(json.dumps(ckpt)))
+    assert {user: n for user, n in xd.nfilled.items() if n} == {user: n for user, n in nfilled.items() if n}
+
+
+def test_grid():
+    from xdplayer.grid import Grid
+    g = Grid(['AB#', ['C', 'HEART', 'É']])
+    assert (g.nrows, g.ncols) == (2, 3)
+    assert g[1][1] == 'HEART'
+    assert g.cell(0, 3) == '#'
+    assert ''.join(g[1]) == 'CHEARTÉ'
+
+    g.set(1, 1, 'X')
+    assert g.rebus == {}
+    g[0][-1] = '☃'
+    assert g.get(0, 2) == '☃'
+    assert [''.join(r) for r in g.cleared()] == ['...', '...']
+    assert g.copy() == g
+
+
+def test_numbering():
+    import random
+    from xdplayer.numbering import number_grid
+
+    def reference(rows):
+        'Cell-by-cell numbering, as Crossword.iteranswers_full used to do it.'
+        def cell(r, c):
+            return rows[r][c] if 0 <= r < len(rows) and 0 <= c < len(rows[0]) else '#'
+        words = []
+        num = 1
+        for r in range(len(rows)):
+            for c in range(len(rows[0])):
+                new_clue = False
+                for dir, dr, dc in [('A', 0, 1), ('D', 1, 0)]:
+                    if cell(r-dr, c-dc) == '#':
+                        n = 0
+                        while cell(r+dr*n, c+dc*n) != '#':
+                            n += 1
+                        if n > 1:
+                            new_clue = True
+                            words.append((dir, num, r, c, n))
+                num += new_clue
+        return words
+
+    rnd = random.Random(5)
+    for i in range(50):
+        nrows, ncols = rnd.randint(1, 12), rnd.randint(1, 12)
+        rows = [''.join(rnd.choice('##AB.') for c in range(ncols)) for r in range(nrows)]
+        assert number_grid(rows) == reference(rows), rows
+
+
+def test_find_coords():
+    xd = Crossword("samples/saulpw-008.xd")
+    assert xd.findCoords('A1') == (0, 0)
+    assert xd.findCoords('A4', 2) == (0, 6)
+    assert xd.findCoords('D4', 2) == (2, 4)
+    assert [xd.acrosses[xd.clue_ordinal[d]] for d in xd.acrosses] == xd.acrosses
+
+
+def test_guesslog():
+    from xdplayer.guesslog import GuessLog
+    with tempfile.TemporaryDirectory() as teamdir:
+        fn = os.path.join(teamdir, 'test.xd-guesses.jsonl')
+        guesslog = GuessLog(fn)
+        guesslog.write(dict(x=0, y=0, ch='A'))
+        with patch('os.write', side_effect=os.write) as write:
+            with guesslog.batch():
+                for x in range(1, 5):
+                    guesslog.write(dict(x=x, y=0, ch='B'))
+            assert write.call_count == 1
+
+        with open(fn) as fp:
+            assert [json.loads(line)['x'] for line in fp] == [0, 1, 2, 3, 4]
+
+        os.chmod(fn, 0o444)
+        try:
+            guesslog.write(dict(x=5, y=0, ch='C'))
+            assert False, 'wrote to a read-only log'
+        except PermissionError:
+            pass
+        guesslog.close()
+
+        assert GuessLog(fn, fsync='soon').fsync == 'never'  # instead of failing every write
+        os.chmod(fn, 0o666)
+        guesslog = GuessLog(fn, fsync=60)
+        with patch('os.fsync') as fsync:
+            guesslog.write(dict(x=6, y=0, ch='D'))  # the first write syncs
+            guesslog.write(dict(x=7, y=0, ch='D'))
+            assert fsync.call_count == 1
+            guesslog.sync_if_due()
+            assert fsync.call_count == 1
+            guesslog.sync_if_due(time.time() + 60)
+            assert fsync.call_count == 2
+            guesslog.write(dict(x=8, y=0, ch='D'))
+            guesslog.close()  # the last rows are synced on close
+            assert fsync.call_count == 3
+
+
+def test_replay_partial_row():
+    for watch in ['inotify', 'stat']:
+        with tempfile.TemporaryDirectory() as teamdir, patch.dict(os.environ, TEAMDIR=teamdir, XDWATCH=watch):
+            xd = Crossword("samples/saulpw-008.xd")
+            row = json.dumps(dict(x=1, y=0, ch='E', user='teammate')) + '\n'
+            with open(xd.guessfn, 'w') as fp:
+                fp.write(json.dumps(dict(x=0, y=0, ch='B', user='teammate')) + '\n' + row[:10])
+
+            xd.replay_guesses()
+            assert (xd.grid.get(0, 0), xd.grid.get(0, 1)) == ('B', '.')
+
+            with open(xd.guessfn, 'a') as fp:
+                fp.write(row[10:])
+            assert xd.replay_guesses()
+            assert (xd.grid.get(0, 0), xd.grid.get(0, 1)) == ('B', 'E')
+            assert xd.lastpos == os.stat(xd.guessfn).st_size
+
+            with patch('builtins.open', side_effect=AssertionError('reread unchanged log')):
+                assert not xd.replay_guesses()
+
+            # a write inotify does not see, as from another host of a network filesystem, is found by the periodic stat
+            with open(xd.guessfn, 'a') as fp:
+                fp.write(json.dumps(dict(x=2, y=0, ch='Z', user='teammate')) + '\n')
+            if watch == 'inotify':
+                try:
+                    os.read(xd.guesswatcher.fd, 65536)  # lose the events
+                except BlockingIOError:
+                    pass
+                xd.guesswatcher.nextstat = 0  # a second later
+            assert xd.replay_guesses()
+            assert xd.grid.get(0, 2) == 'Z'
+            xd.close()
+
+    # with no log yet, only the first replay opens it and reads the checkpoint
+    with tempfile.TemporaryDirectory() as teamdir, patch.dict(os.environ, TEAMDIR=teamdir):
+        xd = Crossword("samples/saulpw-008.xd")
+        with patch('xdplayer.read_checkpoint', return_value=None) as read_ckpt:
+            assert not xd.replay_guesses()
+            assert not xd.replay_guesses()
+        assert read_ckpt.call_count == 1
+        xd.close()
+
+
+def test_checkpoint_and_compact():
+    import random
+    from xdplayer.guesslog import compact, checkpoint_fn
+
+    def state(xd):
+        return (xd.grid, {k: v for k, v in xd.guesser.items() if v}, list(xd.guessercolors.items()), xd.rebus, dict(xd.notes), xd.nsolved)
+
+    def replayed(fn):
+        xd = Crossword(fn)
+        xd.replay_guesses()
+        return xd
+
+    rnd = random.Random(9)
+    xd = Crossword("samples/saulpw-008.xd")
+    cells = list(xd.cross.keys())
+    rows = []
+    for i in range(320):
+        if rnd.random() < 0.05:
+            rows.append(dict(xdid=xd.xdid, dirnum=rnd.choice(xd.acrosses), note=f'note {i}', user=rnd.choice('abc'), time=i))
+        else:
+            x, y = rnd.choice(cells)
+            rows.append(dict(xdid=xd.xdid, x=x, y=y, ch=rnd.choice(['A', 'B', UNFILLED, 'HEART', 'ONE', 'TWO']), user=rnd.choice('abcd')))
+
+    with tempfile.TemporaryDirectory() as teamdir, patch.dict(os.environ, TEAMDIR=teamdir), patch('xdplayer.checkpoint_rows', 100):
+        with open(xd.guessfn, 'w') as fp:
+            fp.writelines(json.dumps(r) + '\n' for r in rows[:300])
+        replayed("samples/saulpw-008.xd")
+        assert os.path.exists(checkpoint_fn(xd.guessfn))
+
+        with open(xd.guessfn, 'a') as fp:
+            fp.writelines(json.dumps(r) + '\n' for r in rows[300:])
+        fresh = replayed("samples/saulpw-008.xd")
+        assert fresh.nreplayed == 20  # only the rows after the checkpoint
+
+        os.unlink(checkpoint_fn(xd.guessfn))
+        full = replayed("samples/saulpw-008.xd")
+        assert state(fresh) == state(full)
+
+        compacted = compact(rows)
+        assert len(compacted) < len(rows)
+        with open(xd.guessfn, 'w') as fp:
+            fp.writelines(json.dumps(r) + '\n' for r in compacted)
+        os.unlink(checkpoint_fn(xd.guessfn))
+        assert state(replayed("samples/saulpw-008.xd")) == state(full)
+
+        # ONE and TWO take the first two rebus symbols; once ONE is gone, TWO keeps its symbol
+        (x1, y1), (x2, y2), (x3, y3) = cells[:3]
+        rows = [dict(xdid=xd.xdid, x=x3, y=y3, ch='B', user='a'),
+                dict(xdid=xd.xdid, x=x1, y=y1, ch='ONE', user='a'),
+                dict(xdid=xd.xdid, x=x2, y=y2, ch='TWO', user='a'),
+                dict(xdid=xd.xdid, x=x1, y=y1, ch='A', user='a')]
+        with open(xd.guessfn, 'w') as fp:
+            fp.writelines(json.dumps(r) + '\n' for r in rows)
+        full = replayed("samples/saulpw-008.xd")
+        with open(xd.guessfn, 'w') as fp:
+            fp.writelines(json.dumps(r) + '\n' for r in compact(rows))
+        assert state(replayed("samples/saulpw-008.xd")) == state(full)
+
+
+@contextmanager
+def headless_player(h, w, fn="samples/wsj110624.xd"):
+    'Yield (scr, plyr) playing *fn* on an *h*x*w* HeadlessScreen, with the guesses log in a temporary TEAMDIR.'
+    with tempfile.TemporaryDirectory() as teamdir, patch.dict(os.environ, TEAMDIR=teamdir):
+        scr = HeadlessScreen(h, w)
+        plyr = CrosswordPlayer([fn])
+        plyr.clock = lambda now: '  :00'
+        try:
+            with patch.object(opt, 'scr', scr, create=True):
+                yield scr, plyr
+        finally:
+            plyr.xd.close()
+
+
+def assert_repaint_matches(scr, plyr, msg=''):
+    'Assert that repainting the whole screen draws what the draws since the last repaint left on it.'
+    drawn = scr.snapshot()
+    plyr.xd.invalidate()
+    plyr.draw(scr, plyr.xd)
+    assert scr.snapshot() == drawn, msg
+
+
+def test_atomic_write():
+    import stat
+    import subprocess
+    import sys
+    from xdplayer.atomicfile import atomic_write
+    with tempfile.TemporaryDirectory() as d:
+        fn = os.path.join(d, 'file.txt')
+        with atomic_write(fn) as fp:
+            fp.write('old')
+        try:
+            with atomic_write(fn) as fp:
+                fp.write('new')
+                raise ValueError
+        except ValueError:
+            pass
+        assert open(fn).read() == 'old'
+        assert os.listdir(d) == ['file.txt']  # no temporary file left behind
+
+        # xdcompact.py keeps a submitted log read-only
+        guessfn = os.path.join(d, 'test.xd-guesses.jsonl')
+        with open(guessfn, 'w') as fp:
+            fp.writelines(json.dumps(dict(x=0, y=0, ch=ch, user='a')) + '\n' for ch in 'ABC')
+        os.chmod(guessfn, 0o444)
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        subprocess.run([sys.executable, 'bin/xdcompact.py', guessfn], env=env, capture_output=True, check=True)
+        assert [json.loads(line)['ch'] for line in open(guessfn)] == ['A', 'C']
+        assert stat.S_IMODE(os.stat(guessfn).st_mode) == 0o444
+
+
+def test_dirty_draw():
+    import random
+    keys = 'KEY_RIGHT KEY_LEFT KEY_UP KEY_DOWN KEY_SRIGHT KEY_SLEFT ^I @ KEY_DC KEY_BACKSPACE'.split() + list('ABC ')
+    rnd = random.Random(11)
+    for h, w in [(40, 120), (36, 56)]:  # the grid scrolls sideways in the smaller screen
+        with headless_player(h, w) as (scr, plyr):
+            plyr.draw(scr, plyr.xd)
+            for i in range(300):
+                plyr.handle_key(scr, plyr.xd, rnd.choice(keys))
+                if i % 25 == 0:  # a teammate guesses and leaves a note
+                    with open(plyr.xd.guessfn, 'a') as fp:
+                        fp.write(json.dumps(dict(x=rnd.randrange(21), y=0, ch='Z', user='teammate')) + '\n')
+                        fp.write(json.dumps(dict(dirnum=plyr.xd.curr_dirnum or 'A1', note='hmm', user='teammate', time=0)) + '\n')
+                    plyr.xd.replay_guesses()
+
+                plyr.draw(scr, plyr.xd)
+                if i % 7 == 0:
+                    xd = plyr.xd
+                    assert all(xd.charcolor(y, x) == xd.viewclass(y, x) for y in range(xd.nrows) for x in range(xd.ncols))
+                    for dirnum, (maxw, lines) in list(xd.clue_lines.items()):
+                        del xd.clue_lines[dirnum]
+                        assert xd.clue_text(dirnum, maxw) == lines, dirnum
+
+                    assert_repaint_matches(scr, plyr, f'after {i+1} keys')
+
+            if h < 40:
+                continue
+
+            # typing a letter redraws a few cells and clues, not the whole screen
+            plyr.xd.invalidate()
+            scr.nwrites = 0
+            plyr.draw(scr, plyr.xd)
+            full = scr.nwrites
+            scr.nwrites = 0
+            plyr.handle_key(scr, plyr.xd, 'X')
+            plyr.draw(scr, plyr.xd)
+            assert scr.nwrites < full/4, (scr.nwrites, full)
+
+
+def test_completion_check():
+    # a full grid with wrong letters shows the status and the underlines in the same draw
+    with headless_player(40, 120, "samples/saulpw-008.xd") as (scr, plyr):
+        xd = plyr.xd
+        plyr.draw(scr, xd)
+        for y, row in enumerate(xd.solution):
+            for x, ch in enumerate(row):
+                if ch != '#':
+                    xd.replay_guess(dict(x=x, y=y, ch='Q' if (x, y) == (0, 0) else ch, user='tester'))
+        plyr.draw(scr, xd)
+        assert 'no cigar! 1 are wrong' in scr.line(38)
+        assert_repaint_matches(scr, plyr)
+
+
+def jumbo_xd(dirname, n):
+    'Write an *n*x*n* puzzle with a clue for every word into *dirname*, and return its path.'
+    from xdplayer.numbering import number_grid
+    rows = [''.join('#' if (x*3 + y*5) % 13 == 0 else 'ABCDEFG'[(x+y) % 7] for x in range(n)) for y in range(n)]
+    clues = []
+    for dir, num, r, c, length in number_grid(rows):
+        answer = rows[r][c:c+length] if dir == 'A' else ''.join(rows[r+i][c] for i in range(length))
+        clues.append(f'{dir}{num}. Clue for {dir}{num} ~ {answer}')
+
+    fn = os.path.join(dirname, 'jumbo.xd')
+    with open(fn, 'w') as fp:
+        fp.write('Title: Jumbo\n\n\n' + '\n'.join(rows) + '\n\n\n' + '\n'.join(clues) + '\n')
+    return fn
+
+
+def test_large_grid():
+    n = 45
+    with tempfile.TemporaryDirectory() as puzdir, headless_player(40, 100, jumbo_xd(puzdir, n)) as (scr, plyr):
+        xd = plyr.xd
+        assert xd.draw(scr)
+        assert xd.view_rows < n and xd.view_cols < n and xd.minimap_tile
+        assert sum(c is not None for c in xd.cellclasses) < n*n/2  # only the viewport was computed
+
+        for i, k in enumerate(['KEY_DOWN']*50 + ['KEY_RIGHT']*50 + list('XYZ')):
+            plyr.handle_key(scr, xd, k)
+            plyr.draw(scr, xd)
+            assert xd.miny <= xd.cursor_y < xd.miny+xd.view_rows
+            assert xd.minx <= xd.cursor_x < xd.minx+xd.view_cols
+            if i % 9 == 0:
+                assert_repaint_matches(scr, plyr, f'after {i+1} keys')
+
+        # the minimap row with the cursor shows its tile partly filled
+        t = xd.minimap_tile
+        assert xd.minimap_line(xd.cursor_y//(2*t))[xd.cursor_x//t] in opt.minimapch[2:-1]
+        xd.clear()
+        assert set(xd.minimap_line(0)) <= set(opt.minimapch[:2])
+
+
+def test_solver_rows():
+    # a fifth solver takes another row below the grid, shrinking the viewport
+    with tempfile.TemporaryDirectory() as puzdir, headless_player(40, 160, jumbo_xd(puzdir, 50)) as (scr, plyr):
+        xd = plyr.xd
+        plyr.draw(scr, xd)
+        view_rows = xd.view_rows
+        for i in range(6):
+            with open(xd.guessfn, 'a') as fp:
+                fp.write(json.dumps(dict(x=i, y=0, ch='Z', user=f'solver{i}')) + '\n')
+            xd.replay_guesses()
+            plyr.draw(scr, xd)
+            assert_repaint_matches(scr, plyr, f'{i+1} solvers')
+        assert xd.view_rows < view_rows
+
+
+def test_cliptext():
+    import random
+    from xdplayer import cliptext
+    rnd = random.Random(5)
+    for i in range(2000):
+        s = ''.join(rnd.choice('abc XYZ.[]') for j in range(rnd.randrange(30)))
+        dispw = rnd.randrange(35)
+        for trunch in ['…', '', '..']:
+            assert cliptext._clipascii(s, dispw, cliptext.dispwidth(trunch), trunch) == cliptext._clipchars(s, dispw, trunch, {}), (s, dispw, trunch)
+
+    assert cliptext.clipstr('中文 clue', 10) == ('中文 clue', 9)
+    assert cliptext.dispwidth('tab\there') == 8
+
+    cache = cliptext.ClipCache(100)
+    for i in range(1000):
+        cache.put((f'é{i:08}',), i)
+    assert cache.nchars <= 100 and len(cache.entries) == 11
+    assert cache.get(('é00000999',)) == 999 and cache.get(('é00000000',)) is None
+
+
+def test_animation():
+    from xdplayer.ddwplay import Animation, load_animation
+    anim = load_animation('xdplayer/ddw/completed.ddw')
+    assert load_animation('xdplayer/ddw/completed.ddw') is anim  # parsed once per process
+    assert anim.ends == list(range(75, anim.total_ms+1, 75))  # the frame rows' own "" frame has no duration
+
+    scr = HeadlessScreen(6, 60)
+    assert anim.draw(scr, 1.0, x=1, y=1) == 1.05
+    assert 'OR' in str(scr)
+    assert anim.draw(scr, anim.total_ms/1000, x=1, y=1) is None
+    assert anim.draw(scr, anim.total_ms/1000 + 0.01, x=1, y=1, loop=True) == (anim.total_ms+75)/1000
+
+
+def test_animation_schedule():
+    from xdplayer.ddwplay import AnimationMgr
+    mgr = AnimationMgr()
+    assert mgr.draw(HeadlessScreen(), 0) is None  # idle: no deadline
+    mgr.tick(10, 1, now=10.5)
+    assert mgr.deadline() == 11
+    mgr.erase(HeadlessScreen(), 13.2)
+    assert mgr.draw(HeadlessScreen(), 13.2) == 14
+
+    clock = [1000.0]
+    with patch('time.time', lambda: clock[0]), headless_player(25, 80) as (scr, plyr):
+        assert plyr.draw(scr, plyr.xd) == 1001  # the clock ticks
+        plyr.animmgr.trigger('completed', loop=True, x=1, y=22)  # over the bottom border of the grid
+        assert plyr.draw(scr, plyr.xd) == 1000.075
+        for i in range(40):
+            clock[0] += 0.03
+            scr.nwrites = 0
+            nextt = plyr.draw(scr, plyr.xd)
+            assert clock[0] < nextt <= clock[0]+0.075
+            assert scr.nwrites < 20, scr.nwrites  # not a full repaint
+            assert_repaint_matches(scr, plyr, f'after {i+1} frames')
+
+
+def test_lazy_imports():
+    import subprocess
+    import sys
+    code = 'import sys, xdplayer; print(" ".join(sorted(sys.modules)))'
+    modules = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split()
+    for m in ['pkg_resources', 'unittest', 'textwrap', 'getpass', 'xdplayer.puz', 'importlib.resources']:
+        assert m not in modules, m
+
+
+def tiny_puz():
+    from xdplayer import puz
+    p = puz.Puzzle()
+    p.width, p.height = 4, 4
+    p.solution = 'CATS.ORE.DEN.SEW'
+    p.fill = '----.---.---.---'
+    p.title, p.author = 'Tiny', 'tests.py'
+    p.clues = ['clue %d' % i for i in range(9)]
+    return p
+
+
+def test_puz():
+    from xdplayer import puz
+    # values from the original per-byte and reduce(operator.add) implementations
+    assert puz.data_cksum(b'ACROSS&DOWN\0') == 37678
+    assert puz.data_cksum(bytes(range(256))*3, 777) == 2313
+    assert puz.scramble_string('CATARDOGSANDMICE', 1234) == 'WOUMBKETBMGMHMOL'
+    assert puz.scramble_string('ABCDEFGHIJKLMNOPQRSTUVWXY', 9999) == 'PAMXIUFRCOZLWHTEQBNYKVGSD'
+    assert puz.unscramble_string('WOUMBKETBMGMHMOL', 1234) == 'CATARDOGSANDMICE'
+
+    p = tiny_puz()
+    p.lock_solution(4321)
+    assert p.solution != 'CATS.ORE.DEN.SEW'
+
+    loaded = puz.load(p.tobytes())  # checksums verified
+    assert loaded.is_solution_locked()
+    assert not loaded.unlock_solution(1111)
+    assert loaded.unlock_solution(4321)
+    assert loaded.solution == 'CATS.ORE.DEN.SEW'
+
+    with tempfile.TemporaryDirectory() as tmpdir, patch.object(puz, 'MMAP_MIN_SIZE', 0):
+        fn = os.path.join(tmpdir, 'tiny.puz')
+        data = b'preamble' + p.tobytes() + b'\r\n'
+        with open(fn, 'wb') as fp:
+            fp.write(data)
+        mapped = puz.read(fn)  # the mmap is closed, so nothing may still refer to it
+        assert (mapped.preamble, mapped.postscript, mapped.title, mapped.clues) == (b'preamble', b'\r\n', 'Tiny', p.clues)
+        assert mapped.tobytes() == data
+
+        with open(fn, 'wb') as fp:
+            fp.write(data[:-40])
+        try:
+            puz.read(fn)
+            assert False, 'truncated file loaded'
+        except puz.PuzzleFormatError:
+            pass
+
+
+def test_xdconvert():
+    import subprocess
+    import sys
+    with tempfile.TemporaryDirectory() as tmpdir, patch.dict(os.environ, XDCACHE=''):
+        os.mkdir(os.path.join(tmpdir, 'sub'))
+        for fn in ['one.puz', 'sub/two.puz']:
+            tiny_puz().save(os.path.join(tmpdir, fn))
+        with open(os.path.join(tmpdir, 'sub/bad.puz'), 'wb') as fp:
+            fp.write(b'not a puzzle')
+
+        def xdconvert(*args):
+            env = dict(os.environ, PYTHONPATH=os.getcwd())
+            return subprocess.run([sys.executable, 'bin/xdconvert.py', '-j', '2', *args], env=env, capture_output=True, text=True)
+
+        r = xdconvert(tmpdir)
+        assert r.returncode == 1, r.stderr  # for bad.puz
+        assert 'bad.puz' in r.stderr and '2 converted, 1 failed, 0 up to date' in r.stdout, r.stdout
+        xd = Crossword(os.path.join(tmpdir, 'sub/two.xd'))
+        assert xd.solution.lines() == ['CATS', '#ORE', '#DEN', '#SEW']  # solutions are kept
+
+        r = xdconvert(tmpdir)
+        assert '0 converted, 1 failed, 2 up to date' in r.stdout, r.stdout
+
+
+def test_palette():
+    scr = HeadlessScreen(25, 80)
+    with patch.object(opt, 'scr', scr, create=True):
+        assert opt.acrattr == scr.colors[opt['acrattr'][0]]
+        assert 'acrattr' in opt.__dict__  # resolved once
+
+        opt.cycle('helpattr')
+        assert 'acrattr' not in opt.__dict__
+        assert opt.helpattr == scr.colors['bold 108']
+        opt.cycle('helpattr')
+    assert opt.acrattr == '210'
+
+    # ^X toggles hotkeys, and the new value survives the invalidation it causes
+    plyr = CrosswordPlayer(["samples/wsj110624.xd"])
+    with patch.object(opt, 'scr', scr, create=True):
+        plyr.handle_key(scr, plyr.xd, '^X')
+        assert opt.hotkeys is True
+        plyr.draw(scr, plyr.xd)
+        assert opt.acrattr == scr.colors[opt['acrattr'][0]]
+        plyr.handle_key(scr, plyr.xd, '^X')
+        assert opt.hotkeys is False
+    del opt.hotkeys
+
+    warnings = []
+    with patch('curses.COLOR_PAIRS', 16, create=True), patch('curses.init_pair'), patch('curses.color_pair', side_effect=lambda c: c << 8):
+        colors = ColorMaker(None, warn=warnings.append)
+        attrs = [colors[f'{fg} on black'] for fg in range(20)]
+    assert len(set(attrs[:15])) == 15
+    assert attrs[15:] == [0]*5  # out of pairs: default colors
+    assert len(warnings) == 2, warnings
+    assert colors.to_name(attrs[3]) == (3, 0)
+
+
+def test_typeahead():
+    with headless_player(40, 120) as (scr, plyr):
+        xd = plyr.xd
+        plyr.draw(scr, xd)
+        assert plyr.handle_input(scr) is None
+
+        scr.keys = list('ABC') + ['KEY_DOWN', 'KEY_UP', 'D']
+        with patch('os.write', wraps=os.write) as write:
+            assert plyr.handle_input(scr) is False
+        assert write.call_count == 1  # one batch of guesses
+        assert ''.join(list(xd.grid[0])[:4]) == 'ABCD'
+
+        # a prompt sees the keys before it applied, and reads the keys after it
+        def rebus_prompt(*args, **kwargs):
+            assert xd.grid.get(0, 4) == 'E'
+            assert open(xd.guessfn).read().count('\n') == 5
+            assert scr.keys == ['F', '^Q']
+            return 'REB'
+        scr.keys = ['E', '^R', 'F', '^Q']
+        with patch('xdplayer.editline', side_effect=rebus_prompt):
+            assert plyr.handle_input(scr) is True
+        rows = [json.loads(line) for line in open(xd.guessfn)]
+        assert [r['ch'] for r in rows[-2:]] == ['REB', 'F']  # F overwrites the rebus in place
+
+
 if __name__ == '__main__':
     test_moves()
+    test_lazy_playlist()
+    test_compiled_cache()
+    test_solve_counters()
+    test_grid()
+    test_numbering()
+    test_find_coords()
+    test_guesslog()
+    test_replay_partial_row()
+    test_checkpoint_and_compact()
+    test_atomic_write()
+    test_dirty_draw()
+    test_completion_check()
+    test_large_grid()
+    test_solver_rows()
+    test_cliptext()
+    test_animation()
+    test_animation_schedule()
+    test_lazy_imports()
+    test_puz()
+    test_xdconvert()
+    test_palette()
+    test_typeahead()
@@ -1,28 +1,37 @@
 #!/usr/bin/env python3
 
-from unittest import mock
-import copy
-import functools
+# This is imported on every login, before the grid appears, so modules only
+# some sessions need (unittest.mock, textwrap, getpass, importlib.resources,
+# puz2xd) are imported where they are used.
 import sys
 import json
 import os
 import stat
 import os.path
-import textwrap
-import getpass
 import time
 import string
 import curses
+import selectors
 from pathlib import Path
-from pkg_resources import resource_filename
-from collections import namedtuple, defaultdict
+from collections import namedtuple, defaultdict, deque, OrderedDict
 
 from .tui import *
-from .puz2xd import gen_xd
 from .ddwplay import AnimationMgr
 from .cliptext import editline, clipdraw
+from .grid import Grid
+from .guesslog import GuessLog, LogWatcher, read_checkpoint, write_checkpoint
+from .numbering import number_grid
+from . import xdcache
 
 UNFILLED = '.'
+checkpoint_rows = 1000  # write a guesses log checkpoint after replaying this many rows
+poll_interval = 0.5  # seconds between checks of the guesses log when it cannot be watched
+NON_ANSWER_CHARS = '_#'
+CURSOR_COLORS = ('acr', 'down', 'curacr', 'curdown')  # charcolor keys drawn reversed
+PROMPT_KEYS = ('^R', '^Y')  # keys that open a prompt
+BLOCKBYTE = ord('#')
+UNFILLEDBYTE = ord(UNFILLED)
+minimap_maxw = 20  # widest minimap, in characters
 
 opt = OptionsObject(
     fgbgattr = ['white on black', 'underline'],
@@ -51,6 +60,8 @@ opt = OptionsObject(
     pc12attr = ['56 on black'],
     pc13attr = ['27 on black'],
     rebuschars = ['123456789'],
+    minimapch = [' ·░▒▓█'],  # tile of only blocks, none filled, partly filled (rising), all filled
+    minimapattr = ['white'],
     circledattr = ['red'],
     helpattr = ['bold 109', 'bold 108', ],
     clueattr = ['7'],
@@ -83,10 +94,48 @@ class EscapeException(BaseException):
     'Inherits from BaseException to avoid "except Exception" clauses. Do not use a blanket "except:" or the task will be uncancelable.'
     pass
 
-@functools.lru_cache
 def half(colors, fg_coloropt, bg_coloropt):
     'Return curses color code for {fg_coloropt} colored character on a {bg_coloropt} colored background.'
-    return colors['%s on %s' % (opt[fg_coloropt+'attr'][0], opt[bg_coloropt+'attr'][0])]
+    key = ('half', fg_coloropt, bg_coloropt)
+    attr = opt.cache.get(key)
+    if attr is None:
+        attr = opt.cache[key] = colors['%s on %s' % (opt[fg_coloropt+'attr'][0], opt[bg_coloropt+'attr'][0])]
+    return attr
+
+
+def reverse(colors, coloropt):
+    'Return curses color code for {coloropt} colors reversed.'
+    key = ('reverse', coloropt)
+    attr = opt.cache.get(key)
+    if attr is None:
+        attr = opt.cache[key] = colors[opt[coloropt+'attr'][0] + ' reverse']
+    return attr
+
+
+def scroll(start, pos, size, lo, hi):
+    'Return where a window of *size* over [lo, hi) starting at *start* should start to show *pos*.  The window recenters on *pos* when it gets near an edge.'
+    margin = min(2, (size-1)//2)
+    if not start+margin <= pos < start+size-margin:
+        start = pos - size//2
+    return max(lo, min(start, hi-size))
+
+
+def getuser():
+    'Return $USER, or the login name if it is not set.'
+    user = os.getenv('USER')
+    if user is None:
+        import getpass
+        user = getpass.getuser()
+    return user
+
+
+def resource_path(name):
+    'Return the path of the package data file *name*.'
+    try:
+        from importlib.resources import files
+    except ImportError:  # python 3.8
+        return os.path.join(os.path.dirname(__file__), name)
+    return str(files(__name__) / name)
 
 
 def log(*args):
@@ -96,6 +145,23 @@ def log(*args):
 
 class Crossword:
     def __init__(self, fn):
+        # what changed since the last draw
+        self.repaint = True  # everything
+        self.dirty = set()  # (y, x) of grid cells
+        self.dirty_panels = set()  # names of panels: meta, clues, notes, solvers
+        self.spans = defaultdict(list)  # panel name -> [(y, x, width)] drawn on screen
+        self.dirty_borders = False  # the lines above and below the grid
+        self.drawn_layout = None
+        self.drawn_filldir = None
+        self.cellclasses = None  # charcolor() of each cell, row-major; see update_view
+        self.view_cursor = None  # (cursor_x, cursor_y, filldir) that cellclasses highlights
+        self.drawn_keys = {}  # panel name -> what it showed when last drawn
+        self.clue_lines = {}  # dirnum -> (width, lines of the clue and its guess); see clue_text
+        self.visible_clues = set()  # dirnums in the clue panels as last drawn
+        self.miny, self.minx = 0, -1  # grid cell in the top left corner of the viewport; see scroll_view
+        self.minimap_tile = 0  # minimap characters each show 2*minimap_tile rows by minimap_tile columns; 0 if there is no minimap
+        self.minimap_lines = {}  # minimap row -> its characters; see minimap_line
+
         self.checkable = False
         self.acrosses = []
         self.downs = []
@@ -104,18 +170,31 @@ class Crossword:
 
         if fn.endswith('.puz'):
             self.fn = fn[:-4] + '.xd'
-            self.load_puz(fn)
         else:
             self.fn = fn
-            self.load()
+
+        key = xdcache.sourcekey(fn)
+        compiled = xdcache.load(fn, key)
+        if compiled:
+            self.load_compiled(compiled)
+        else:
+            if fn.endswith('.puz'):
+                self.load_puz(fn)
+            else:
+                self.load()
+            xdcache.save(fn, key, self.compile())
 
         self.filldir = 'A'
         self.cursor_x = -1
         self.cursor_y = 0
         self.cursorRight(1)
         self.lastpos = 0  # for incremental replay_guesses
+        self.rescan = True  # replay_guesses reads the log even if the watcher saw no change
+        self.nreplayed = 0  # rows replayed since the last checkpoint
 
         self.undos = []  # list of guess rows that have been written since last move
+        self.guesslog = GuessLog(self.guessfn)
+        self.guesswatcher = None  # LogWatcher, created on first replay
         self.clue_layout = {}
         self.notes = defaultdict(list)
         self.starting_note = 0
@@ -126,6 +205,7 @@ class Crossword:
         self.load_xd(open(self.fn, encoding='utf-8').read())
 
     def load_puz(self, fn):
+        from .puz2xd import gen_xd
         self.load_xd('\n'.join(gen_xd(fn)))
 
     def load_xd(self, contents):
@@ -138,17 +218,11 @@ class Crossword:
 
         rebus_soln = dict(r.split('=') for r in self.meta['Rebus'].split(',')) if 'Rebus' in self.meta else {}
 
-        self.solution = [
+        self.solution = Grid(
             list(rebus_soln.get(ch, ch) for ch in line)
                 for line in gridstr.splitlines()
-        ]
-
-        self.clear()
-        self.nrows = len(self.grid)
-        self.ncols = len(self.grid[0])
-
-        self.guesser = defaultdict(dict)  # (x,y) -> guess row
-        self.guessercolors = defaultdict(str)
+        )
+        self.reset_board()
 
         self.clues = {}  # 'A1' -> Clue
         for clue in cluestr.splitlines():
@@ -165,41 +239,172 @@ class Crossword:
                     self.downs.append(dirnum)
                 self.clues[dirnum] = BoardClue(dir, num, clue, answer, [])  # final is board positions, filled in below
 
-        self.cross = defaultdict(lambda: Cross(None, None))
-        for dir, num, answer, r, c, in self.iteranswers_full():
+        across, down = {}, {}  # (x,y) -> BoardClue
+        for dir, num, r, c, n in number_grid(self.grid.lines(), NON_ANSWER_CHARS):
             clue = self.clues[f'{dir}{num}']
-            for i in range(len(answer)):
-                coord = (c+i, r) if dir == 'A' else (c, r+i)
-                clue.coords.append(coord)
-            for c in clue.coords:
-                if dir == 'A' and not self.cross[c].across:
-                    self.cross[c] = self.cross[c]._replace(across=clue)
-                elif not self.cross[c].down:
-                    self.cross[c] = self.cross[c]._replace(down=clue)
+            if dir == 'A':
+                clue.coords.extend((c+i, r) for i in range(n))
+                words = across
+            else:
+                clue.coords.extend((c, r+i) for i in range(n))
+                words = down
+            for xy in clue.coords:
+                words.setdefault(xy, clue)
+
+        self.cross = defaultdict(lambda: Cross(None, None))
+        for xy in {**across, **down}:
+            self.cross[xy] = Cross(across.get(xy), down.get(xy))
+
+        self.index_clues()
+
+    def reset_board(self):
+        self.clear()
+        self.nrows = self.grid.nrows
+        self.ncols = self.grid.ncols
+
+        self.guesser = defaultdict(dict)  # (x,y) -> guess row
+        self.guessercolors = defaultdict(str)
+
+    def compile(self):
+        'Return the parsed puzzle as nested tuples of builtins, to be stored by xdcache and restored by load_compiled.'
+        def dirnum(clue):
+            return f'{clue.dir}{clue.num}' if clue else ''
+
+        return (
+            tuple(self.meta.items()),
+            (self.solution.nrows, self.solution.ncols, bytes(self.solution.cells), tuple(self.solution.rebus.items())),
+            tuple((dirnum, clue.clue, clue.answer, tuple(clue.coords)) for dirnum, clue in self.clues.items()),
+            tuple((xy, dirnum(across), dirnum(down)) for xy, (across, down) in self.cross.items()),
+        )
+
+    def load_compiled(self, compiled):
+        meta, solution, clues, cross = compiled
+
+        self.meta = dict(meta)
+        self.solution = Grid.frombytes(*solution)
+        self.reset_board()
+
+        self.clues = {}  # 'A1' -> Clue
+        for dirnum, clue, answer, coords in clues:
+            if dirnum[0] == 'A':
+                self.acrosses.append(dirnum)
+            else:
+                self.downs.append(dirnum)
+            self.clues[dirnum] = BoardClue(dirnum[0], int(dirnum[1:]), clue, answer, list(coords))
+
+        self.cross = defaultdict(lambda: Cross(None, None))
+        for xy, across, down in cross:
+            self.cross[xy] = Cross(self.clues.get(across), self.clues.get(down))
+
+        self.index_clues()
+
+    def index_clues(self):
+        'Build the clue lookup tables used for navigation and drawing, once per load.'
+        self.acr_clues = {dirnum: self.clues[dirnum] for dirnum in self.acrosses}
+        self.down_clues = {dirnum: self.clues[dirnum] for dirnum in self.downs}
+
+        self.clue_ordinal = {}  # 'A1' -> index into self.acrosses (or 'D1' into self.downs)
+        for dirnums in (self.acrosses, self.downs):
+            self.clue_ordinal.update((dirnum, i) for i, dirnum in enumerate(dirnums))
 
     def move_grid(self, x, y, w, h):
         global grid_bottom, grid_right, grid_top, grid_left
         global clue_left, clue_top, clue_minw
+        global minimap_left
         grid_left = x
         grid_top = y
-        grid_bottom = grid_top + self.nrows
-        grid_right = grid_left + self.ncols*2
         clue_minw = 25
-        clue_left = min(grid_right, w-clue_minw+2)+3
+
+        # A grid too big for the screen is shown through a viewport, with
+        # a minimap of the whole grid between it and the clues.
+        self.view_rows = self.nrows
+        if grid_top + self.nrows + 2 > h:
+            self.view_rows = max(1, h - grid_top - 3 - self.max_solver_rows)
+        self.view_cols = (w-clue_minw+1 - grid_left)//2 + 1  # counting the half cell left of column 0
+        tile = 0
+        if self.view_rows < self.nrows or self.view_cols < self.ncols+1:
+            tile = max(-(-self.ncols//minimap_maxw), -(-self.nrows//(2*self.view_rows)))
+            mmw = -(-self.ncols//tile)
+            self.view_cols = max(1, (w-clue_minw+1 - mmw-2 - grid_left)//2 + 1)
+        self.view_cols = min(self.view_cols, self.ncols+1)
+        if tile != self.minimap_tile:
+            self.minimap_tile = tile
+            self.minimap_lines.clear()
+
+        grid_bottom = grid_top + self.view_rows
+        grid_right = grid_left + (self.view_cols-1)*2
+        minimap_left = grid_right+3
+        if tile:
+            clue_left = minimap_left + mmw + 3
+        else:
+            clue_left = min(grid_right, w-clue_minw+2)+3
         clue_top = grid_top
 
+    def scroll_view(self):
+        'Scroll the viewport to keep the cursor in it, and return the (y, x) of its top left cell.'
+        self.miny = scroll(self.miny, self.cursor_y, self.view_rows, 0, self.nrows)
+        self.minx = scroll(self.minx, self.cursor_x, self.view_cols, -1, self.ncols)
+        return self.miny, self.minx
+
     def clear(self):
-        self.grid = [['#' if x == '#' else UNFILLED for x in row] for row in self.solution]
+        self.grid = self.solution.cleared()
+        self.recount()
+        self.nfilled = defaultdict(int)  # user -> filled cells they guessed last
+        self.clue_lines.clear()
+        self.minimap_lines.clear()
+        self.invalidate()
+
+    def recount(self):
+        'Recompute the solve counters from the whole grid; set_cell keeps them current after that.'
+        self.ncells = 0    # number of non-block cells
+        self.nsolved = 0   # number of filled cells
+        self.ncorrect = 0  # number of cells matching the solution
+
+        grid, soln = self.grid.cells, self.solution.cells
+        if not (self.grid.rebus or self.solution.rebus) and grid.isascii() and soln.isascii():
+            self.ncells = len(grid) - grid.count(b'#')
+            self.nsolved = self.ncells - grid.count(b'.')
+            self.ncorrect = sum(1 for a, b in zip(grid.upper(), soln.upper()) if a == b and a != BLOCKBYTE)
+            return
+
+        for ch, soln in zip(self.grid.chars(), self.solution.chars()):
+            self.ncells += ch != '#'
+            self.nsolved += ch not in '.#'
+            self.ncorrect += ch != '#' and ch.upper() == soln.upper()
+
+    def set_cell(self, x, y, ch):
+        'Set the grid cell at (x, y) to *ch*, updating the solve counters incrementally.'
+        oldch = self.grid.get(y, x)
+        soln = self.solution.get(y, x).upper()
+        self.ncells += (ch != '#') - (oldch != '#')
+        self.nsolved += (ch not in '.#') - (oldch not in '.#')
+        self.ncorrect += (ch != '#' and ch.upper() == soln) - (oldch != '#' and oldch.upper() == soln)
+        self.nfilled[self.guesser[(x,y)].get('user', '')] += (ch not in '.#') - (oldch not in '.#')
+        self.grid.set(y, x, ch)
+        if (ch == '#') != (oldch == '#') and self.cellclasses is not None:
+            self.cellclasses[y*self.ncols + x] = None
+        self.touch(y, x)
+        for word in self.cross.get((x, y), ()):
+            if word:
+                dirnum = f'{word.dir}{word.num}'
+                self.clue_lines.pop(dirnum, None)
+                if dirnum in self.visible_clues:
+                    self.dirty_panels.add('clues')
+        self.dirty_panels.add('solvers')  # solver percentages
+        if self.minimap_tile:
+            self.minimap_lines.pop(y//(2*self.minimap_tile), None)
+            self.dirty_panels.add('minimap')
 
     def solve(self):
-        for y, row in enumerate(self.grid):
-            for x, ch in enumerate(row):
-                if ch == UNFILLED:
-                    self.setAt(x, y, self.solution[y][x], user='solver')
+        with self.guesslog.batch():
+            for y, row in enumerate(self.grid):
+                for x, ch in enumerate(row):
+                    if ch == UNFILLED:
+                        self.setAt(x, y, self.solution.get(y, x), user='solver')
 
     def grade(self):
         'Return the number of correct tiles'
-        return sum(1 for y, r in enumerate(self.grid) for x, c in enumerate(r) if c != '#' and c.upper() == self.solution[y][x].upper())
+        return self.ncorrect
 
     @property
     def guessfn(self):
@@ -209,21 +414,10 @@ class Crossword:
     def xdid(self):
         return Path(self.fn).stem
 
-    @property
-    def acr_clues(self):
-        return {k:v for k, v in self.clues.items() if k[0] == 'A'}
-
-    @property
-    def down_clues(self):
-        return {k:v for k, v in self.clues.items() if k[0] == 'D'}
-
-    @property
-    def ncells(self):
-        return len([c for r in self.grid for c in r if c != '#'])
-
-    @property
-    def nsolved(self):
-        return len([c for r in self.grid for c in r if c not in '.#'])
+    def close(self):
+        self.guesslog.close()
+        if self.guesswatcher:
+            self.guesswatcher.close()
 
     def mark_done(self):
         try:
@@ -232,45 +426,16 @@ class Crossword:
             return
 
     def cell(self, r, c):
-        if r < 0 or c < 0 or r >= self.nrows or c >= self.ncols:
-            return '#'
-        return self.grid[r][c]
+        return self.grid.cell(r, c)
 
     def iteranswers_full(self):
         'Generate ("A" or "D", clue_num, answer, r, c) for each word in the grid.'
-
-        NON_ANSWER_CHARS = '_#'
-        clue_num = 1
-        for r, row in enumerate(self.solution):
-            for c, cell in enumerate(row):
-                # compute number shown in box
-                new_clue = False
-                if self.cell(r, c - 1) in NON_ANSWER_CHARS:  # across clue start
-                    ncells = 0
-                    answer = ""
-                    while self.cell(r, c + ncells) not in NON_ANSWER_CHARS:
-                        cellval = self.cell(r, c + ncells)
-                        answer += cellval
-                        ncells += 1
-
-                    if ncells > 1:
-                        new_clue = True
-                        yield "A", clue_num, answer, r, c
-
-                if self.cell(r - 1, c) in NON_ANSWER_CHARS:  # down clue start
-                    ncells = 0
-                    answer = ""
-                    while self.cell(r + ncells, c) not in NON_ANSWER_CHARS:
-                        cellval = self.cell(r + ncells, c)
-                        answer += cellval
-                        ncells += 1
-
-                    if ncells > 1:
-                        new_clue = True
-                        yield "D", clue_num, answer, r, c
-
-                if new_clue:
-                    clue_num += 1
+        for dir, num, r, c, n in number_grid(self.grid.lines(), NON_ANSWER_CHARS):
+            if dir == 'A':
+                answer = ''.join(self.grid.get(r, c+i) for i in range(n))
+            else:
+                answer = ''.join(self.grid.get(r+i, c) for i in range(n))
+            yield dir, num, answer, r, c
 
     def is_cursor(self, y, x, down=False):
         'Is the cell located in the current down cursor (down=true) or across cursor (down=False)?'
@@ -284,7 +449,57 @@ class Crossword:
         return getattr(cursor_words, dir) == getattr(cell_words, dir)
 
     def charcolor(self, y, x, half=True):
-        'Return the curses color key for the character at pos y, x (to be used in half() or opt[key + "attr"]).'
+        'Return the curses color key for the character at pos y, x (to be used in half() or opt[key + "attr"]), as of the last update_view().'
+        if 0 <= y < self.nrows and 0 <= x < self.ncols:
+            i = y*self.ncols + x
+            clr = self.cellclasses[i]
+            if clr is None:
+                clr = self.cellclasses[i] = self.viewclass(y, x)
+            return clr
+        return 'block'
+
+    def update_view(self):
+        '''Bring the color key of each cell up to date with the cursor and fill
+        direction.  Only the cells of the words through the old and the new
+        cursor are recomputed, and those that changed are marked to be redrawn.
+        After invalidate(), each cell is computed when charcolor() first needs
+        it, so drawing a viewport does not compute the whole grid.'''
+        cursor = (self.cursor_x, self.cursor_y, self.filldir)
+        if self.cellclasses is None:
+            self.cellclasses = [None]*(self.nrows*self.ncols)
+        elif cursor != self.view_cursor:
+            x, y, _ = self.view_cursor
+            for x, y in self.word_cells(x, y) + self.word_cells(self.cursor_x, self.cursor_y):
+                if 0 <= y < self.nrows and 0 <= x < self.ncols:
+                    i = y*self.ncols + x
+                    if self.cellclasses[i] is None:  # not drawn since computed
+                        continue
+                    clr = self.viewclass(y, x)
+                    if self.cellclasses[i] != clr:
+                        self.cellclasses[i] = clr
+                        self.touch(y, x)
+        self.view_cursor = cursor
+
+    def word_cells(self, x, y):
+        'Return the (x, y) of cell (x, y) and of the cells in the across and down words through it.'
+        cells = [(x, y)]
+        for word in self.cross.get((x, y), ()):
+            if word:
+                cells.extend(word.coords)
+        return cells
+
+    def toggle_circled(self, y, x):
+        'Circle the cell at (y, x), or uncircle it if it was circled.'
+        if (y, x) in self.circled:
+            self.circled.remove((y, x))
+        else:
+            self.circled.append((y, x))
+        if self.cellclasses is not None:
+            self.cellclasses[y*self.ncols + x] = None
+        self.touch(y, x)
+
+    def viewclass(self, y, x):
+        'Compute the color key for the character at pos y, x with the current cursor; see charcolor().'
         ch = self.cell(y, x)
         if (y, x) in self.circled:
             return 'circled'
@@ -296,6 +511,7 @@ class Crossword:
         if acurs and dcurs: return 'curacr' if self.filldir == 'A' else 'curdown' # cell is intersect cursor, colored depending on current filldir
         if acurs: return 'acr' # cell is across cursor, but not intersect
         if dcurs: return 'down' # cell is down cursor, but not intersect
+        return ''  # None marks cellclasses not yet computed
 
     @property
     def curr_dirnum(self):
@@ -307,154 +523,313 @@ class Crossword:
             if not cursor_down: return ''
             return f'D{cursor_down.num}'
 
+    def invalidate(self):
+        'Repaint the whole screen on the next draw.'
+        self.repaint = True
+        self.cellclasses = None
+
+    def touch(self, y, x):
+        'Mark the cell at (y, x) to be redrawn on the next draw.'
+        self.dirty.add((y, x))
+        self.dirty.add((y, x-1))  # the right half of the cell to the left is drawn in the colors of both
+
+    def damage(self, spans):
+        'Mark whatever was drawn under *spans*, [(y, x, width)] of the screen overwritten since the last draw, to be redrawn on the next draw.'
+        if self.drawn_layout is None:
+            return
+        for y, x, n in spans:
+            if grid_top <= y < grid_bottom:
+                for scrx in range(max(x, grid_left-1), min(x+n, grid_right+1)):
+                    self.touch(y-grid_top+self.miny, (scrx-grid_left+1)//2+self.minx)
+            elif y in (grid_top-1, grid_bottom) and x <= grid_right and grid_left < x+n:
+                self.dirty_borders = True
+            for panel, pspans in self.spans.items():
+                if any(py == y and px < x+n and x < px+pn for py, px, pn in pspans):
+                    self.dirty_panels.add(panel)
+
+    def paint(self, scr, panel, y, x, s, attr):
+        'clipdraw *s* as part of *panel*, remembering where so it can be cleared before the panel is redrawn.'
+        dispw = clipdraw(scr, y, x, s, attr)
+        if dispw:
+            self.spans[panel].append((y, x, dispw))
+        return dispw
+
     def draw(self, scr):
+        '''Draw the puzzle.  Only cells and panels that changed since the last
+        draw are redrawn, unless invalidate() was called or the layout changed.
+        Return True if the whole screen was repainted.'''
         if not scr:
+            from unittest import mock
             scr = mock.MagicMock(__bool__=mock.Mock(return_value=False))
         # so that tests don't try to draw to the screen
         if not scr.colors:
             return
 
-        scr.erase()
-        scr.bkgd(' ', opt.fgbgattr)
-
         h, w = scr.getmaxyx()
 
-        meta = copy.copy(self.meta)
+        meta = dict(self.meta)
         if 'Rebus' in meta:
             del meta['Rebus']
         if self.rebus:
             meta['Rebus'] = ' '.join(sorted(f'{symbol}={word}' for word, (symbol, _) in self.rebus.items()))
 
-        self.move_grid(3, max(0, min(h-self.nrows-2, len(meta)+1)), w, h)
-
-        # draw meta
-        y = 0
-        for k, v in meta.items():
-            if y >= grid_top-1:
-                break
-            clipdraw(scr, y, 1, '%10s: %s' % (k, v), 0)
-            y += 1
+        # as many meta lines as fit above the grid; a grid taller than the screen scrolls below at most a quarter of it
+        top = h-self.nrows-2 if self.nrows+3 <= h else h//4
+        self.move_grid(3, max(1, min(top, len(meta)+1)), w, h)
+        miny, minx = self.scroll_view()
+        maxy, maxx = min(self.nrows, miny+self.view_rows), min(self.ncols, minx+self.view_cols)
 
-        # draw grid
-        d = opt
         cursor_across, cursor_down = self.cross[(self.cursor_x, self.cursor_y)]
+        layout = (h, w, grid_top, clue_left, miny, minx, self.view_rows, self.view_cols, self.checkable)
+        panelkeys = dict(
+            meta=tuple(meta.items()),
+            clues=(cursor_across, cursor_down, self.filldir),
+            notes=(self.curr_dirnum, self.starting_note, self.max_solver_rows),
+            solvers=self.max_solver_rows,
+            minimap=(miny, minx),
+        )
+
+        self.update_view()
+        repaint = self.repaint or layout != self.drawn_layout
+        if repaint:
+            scr.erase()
+            scr.bkgd(' ', opt.fgbgattr)
+            self.dirty.clear()
+            self.spans.clear()
+            self.dirty_panels.update(panelkeys)
+            self.draw_grid(scr, miny, minx)
+        else:
+            if self.dirty_borders:
+                self.draw_borders(scr, miny, minx)
+            if self.drawn_filldir != self.filldir:  # block arrows point in the fill direction
+                self.dirty.update((y, x) for y in range(miny, maxy) for x in range(max(0, minx), maxx) if self.grid.get(y, x) == '#')
+
+            for y, x in self.dirty:
+                if miny <= y < maxy and minx <= x < maxx:
+                    scry = grid_top + y - miny
+                    scrx = grid_left-1 + (x-minx)*2
+                    self.draw_cell(scr, y, x, scry, scrx, self.charcolor(y, x), self.charcolor(y, x+1))
+            self.dirty.clear()
+        self.dirty_borders = False
+
+        self.drawn_layout = layout
+        self.drawn_filldir = self.filldir
+
+        for panel, key in panelkeys.items():
+            if self.drawn_keys.get(panel) != key:
+                self.dirty_panels.add(panel)
+                self.drawn_keys[panel] = key
+
+        # Clear and redraw the panels that changed.  Panels may overlap, so
+        # unchanged panels under what was cleared or redrawn are redrawn too,
+        # in the same order as a full repaint.
+        drawers = dict(
+            meta=lambda: self.draw_meta(scr, meta),
+            clues=lambda: self.draw_clue_panels(scr),
+            notes=lambda: self.draw_notes(scr),
+            solvers=lambda: self.draw_solvers(scr),
+            minimap=lambda: self.draw_minimap(scr),
+        )
+        damaged = defaultdict(list)  # screen y -> [(x, width)] cleared or drawn so far
+        for panel in self.dirty_panels:
+            for y, x, n in self.spans.pop(panel, ()):
+                scr.addstr(y, x, ' '*n, 0)
+                damaged[y].append((x, n))
+
+        for panel, drawer in drawers.items():
+            spans = self.spans.get(panel, ())
+            if panel in self.dirty_panels or any(x < dx+dn and dx < x+n for y, x, n in spans for dx, dn in damaged.get(y, ())):
+                self.spans[panel] = []
+                drawer()
+                for y, x, n in self.spans[panel]:
+                    damaged[y].append((x, n))
+        self.dirty_panels.clear()
+
+        self.repaint = False
+        return repaint
+
+    def draw_cell(self, scr, y, x, scry, scrx, clr, fclr):
+        'Draw grid cell (y, x) at screen (scry, scrx), given its color key and that of the cell to its right.'
+        ch = self.cell(y, x)
+        fclr = fclr or 'bg' # following color
+
+        ch1 = ch if len(ch) == 1 else self.rebus[ch][0] # printed character
+        ch2 = opt.leftblankch # printed second half
+
+        if clr in CURSOR_COLORS:
+            attr1 = reverse(scr.colors, clr)
+        elif ch != '#':
+            attr1 = getattr(opt, self.guessercolors.get(self.guesser[(x,y)].get('user', ''), 'fgbg')+'attr')
+            if self.checkable and self.solution.get(y, x) != ch:
+                attr1 |= curses.A_UNDERLINE
+            clr = None
+        elif clr:
+            attr1 = getattr(opt, clr+'attr')
+        else:
+            attr1 = scr.colors[self.guessercolors.get(self.guesser[(x,y)].get('user', ''), 'white') + ' on black']
+
+        if ch == UNFILLED:
+            ch1 = opt.unsolved_char
+        elif ch == '#':
+            if self.filldir == 'A':
+                ch1 = opt.rightarrow
+                attr1 = opt.arrowacrattr
+            else:
+                ch1 = opt.downarrow
+                attr1 = opt.arrowdownattr
 
-        charcolors = {y:{x:self.charcolor(y, x) for x in range(-1, self.ncols+2)} for y in range(-1, self.nrows+2)}
-        cells = {y:{x:self.cell(y, x) for x in range(-1, self.ncols+2)} for y in range(-1, self.nrows+2)}
+        if clr or fclr:
+            attr2 = half(scr.colors, clr or 'bg', fclr or 'bg')  # colour of ch2
+        else:
+            attr2 = scr.colors['white on black']
 
-        scry = grid_top
-        ya = self.cursor_y - h//2
-        yb = self.nrows-h+2
-        miny = max(0, min(ya, yb))
-        for y in range(miny, len(self.grid)):
-            if scry > h-1: break
-            xa = self.cursor_x - (w-clue_minw)//4
-            xb = self.ncols-(w-clue_minw)//2
-            minx = max(-1, min(xa, xb))
+        if x >= 0:  # don't show left corners
+            scr.addstr(scry, scrx, ch1, attr1)
+        scr.addstr(scry, scrx+1, ch2, attr2)
 
+    def draw_grid(self, scr, miny, minx):
+        'Draw the cells in the viewport, with (miny, minx) in the top left corner, and its borders.'
+        maxx = min(self.ncols, minx+self.view_cols)
+        scry = grid_top
+        for y in range(miny, min(self.nrows, miny+self.view_rows)):
             scrx = grid_left-1
-            for x in range(minx, self.ncols):
-                if scrx > w-clue_minw: break
-
-                ch = cells[y][x]
-                clr = charcolors[y][x]
-                fch = cells[y][x+1]  # following char
-                fclr = charcolors[y][x+1] or 'bg' # following color
-
-                ch1 = ch if len(ch) == 1 else self.rebus[ch][0] # printed character
-                ch2 = opt.leftblankch # printed second half
-                attr1 = scr.colors[self.guessercolors.get(self.guesser[(x,y)].get('user', ''), 'white') + ' on black']
-
-                if clr in "acr down curacr curdown".split():
-                    attr1 = scr.colors[opt[clr+'attr'][0] + ' reverse']
-                elif ch != '#':
-                    attr1 = getattr(opt, self.guessercolors.get(self.guesser[(x,y)].get('user', ''), 'fgbg')+'attr')
-                    if self.checkable and self.solution[y][x] != ch:
-                        attr1 |= curses.A_UNDERLINE
-                    clr = None
-                elif clr:
-                    attr1 = getattr(opt, clr+'attr')
-
-                if ch == UNFILLED:
-                    ch1 = opt.unsolved_char
-                elif ch == '#':
-                    if self.filldir == 'A':
-                        ch1 = opt.rightarrow
-                        attr1 = opt.arrowacrattr
-                    else:
-                        ch1 = opt.downarrow
-                        attr1 = opt.arrowdownattr
-
-                if clr or fclr:
-                    attr2 = half(scr.colors, clr or 'bg', fclr or 'bg')  # colour of ch2
-                else:
-                    attr2 = scr.colors['white on black']
-
-                if x >= 0:  # don't show left corners
-                    scr.addstr(scry, scrx, ch1, attr1)
-                scr.addstr(scry, scrx+1, ch2, attr2)
+            for x in range(minx, maxx):
+                self.draw_cell(scr, y, x, scry, scrx, self.charcolor(y, x), self.charcolor(y, x+1))
                 scrx += 2
             scry += 1
+        self.draw_borders(scr, miny, minx)
+
+    def draw_borders(self, scr, miny, minx):
+        'Draw the lines above and below the viewport.'
+        maxy, maxx = min(self.nrows, miny+self.view_rows), min(self.ncols, minx+self.view_cols)
+        borderw = (maxx-minx)*2-1
+        clipdraw(scr, grid_top-1, grid_left, opt.topch*borderw, opt.topattr)
+        clipdraw(scr, grid_top+maxy-miny, grid_left, opt.botch*borderw, opt.botattr)
+
+    def minimap_line(self, i):
+        'Return row *i* of the minimap: a character per tile of cells, showing how much of the tile is filled.'
+        line = self.minimap_lines.get(i)
+        if line is None:
+            t = self.minimap_tile
+            chars = opt.minimapch
+            cells = self.grid.cells
+            line = ''
+            for x in range(0, self.ncols, t):
+                nopen = nfilled = 0
+                for y in range(2*t*i, min(self.nrows, 2*t*(i+1))):
+                    j = y*self.ncols + x
+                    tilerow = cells[j:j+min(t, self.ncols-x)]
+                    nblocks = tilerow.count(BLOCKBYTE)
+                    nopen += len(tilerow) - nblocks
+                    nfilled += len(tilerow) - nblocks - tilerow.count(UNFILLEDBYTE)
+                if not nopen:
+                    line += chars[0]
+                elif nfilled == nopen:
+                    line += chars[-1]
+                else:
+                    line += chars[1 if not nfilled else 2 + nfilled*(len(chars)-3)//nopen]
+            self.minimap_lines[i] = line
+        return line
+
+    def draw_minimap(self, scr):
+        'Draw the minimap of the whole grid, with the tiles in the viewport reversed.'
+        t = self.minimap_tile
+        if not t:
+            return
+        h, w = scr.getmaxyx()
+        left = max(0, self.minx)//t
+        right = -(-(self.minx+self.view_cols)//t)
+        for i in range(-(-self.nrows//(2*t))):
+            y = grid_top+i
+            if y >= h-2:
+                break
+            line = self.minimap_line(i)
+            if self.miny < 2*t*(i+1) and 2*t*i < self.miny+self.view_rows:
+                self.paint(scr, 'minimap', y, minimap_left, line[:left], opt.minimapattr)
+                self.paint(scr, 'minimap', y, minimap_left+left, line[left:right], opt.minimapattr | curses.A_REVERSE)
+                self.paint(scr, 'minimap', y, minimap_left+right, line[right:], opt.minimapattr)
+            else:
+                self.paint(scr, 'minimap', y, minimap_left, line, opt.minimapattr)
+
+    def draw_meta(self, scr, meta):
+        for y, (k, v) in enumerate(meta.items()):
+            if y >= grid_top-1:
+                break
+            self.paint(scr, 'meta', y, 1, '%10s: %s' % (k, v), 0)
 
-        clipdraw(scr, grid_top-1, grid_left, opt.topch*(self.ncols*2+1), opt.topattr)
-        clipdraw(scr, scry,grid_left, opt.botch*(scrx-grid_left), opt.botattr)
+    def draw_clue_panels(self, scr):
+        h, w = scr.getmaxyx()
+        cursor_across, cursor_down = self.cross[(self.cursor_x, self.cursor_y)]
 
-        def draw_clues(clue_top, clues, cursor_clue, n):
+        def draw_clues(clue_top, dirnums, cursor_clue, n):
             'Draw clues around cursor in one direction.'
-            dirnums = list(clues.values())
-            i = dirnums.index(cursor_clue) if cursor_clue else 0
+            i = self.clue_ordinal[f'{cursor_clue.dir}{cursor_clue.num}'] if cursor_clue else 0
             y = 0  # number of clue lines drawn
-            for j, clue in enumerate(dirnums[max(i-2,0):]):
+            for j in range(len(dirnums)-max(i-2,0)):
                 if y >= n and j > 2:
                     return y
+                dirnum = dirnums[max(i-2,0)+j]
+                clue = self.clues[dirnum]
                 if cursor_clue == clue:
                     attr = (opt.acrattr if clue.dir == 'A' else opt.downattr) | curses.A_REVERSE
                     if self.filldir == clue.dir:
                         arrow = opt.rightarrow if self.filldir == 'A' else opt.downarrow
-                        clipdraw(scr, clue_top+y, clue_left-2, f'{arrow} ', (opt.acrattr if clue.dir == 'A' else opt.downattr))
+                        self.paint(scr, 'clues', clue_top+y, clue_left-2, f'{arrow} ', (opt.acrattr if clue.dir == 'A' else opt.downattr))
                 else:
                     attr = opt.clueattr
 
-                dirnum = f'{clue.dir}{clue.num}'
-                guess = ''.join([self.grid[c][r] for r, c in self.clues[dirnum][-1]])
                 self.clue_layout[dirnum] = y
+                self.visible_clues.add(dirnum)
                 dnw = len(dirnum)+2
-                maxw = max(min(w-clue_left-dnw-1, 40), 1)
+                maxw = max(min(w-clue_left-dnw-2, 40), 1)
 
                 # add a user coloured "*", for the most recent user
                 # who left a note
                 note = self.notes.get(dirnum, None)
                 if note:
                     note_attr = self.get_user_attr(note[-1]['user'])
-                    clipdraw(scr, clue_top+y, clue_left, "*", note_attr)
+                    self.paint(scr, 'clues', clue_top+y, clue_left, "*", note_attr)
 
-                for j, line in enumerate(textwrap.wrap(clue.clue + f' [{guess}]', width=maxw)):
-                    prefix = f'{dirnum}. ' if j == 0 else ' '*dnw
-                    line = prefix + line + ' '*(maxw-len(line))
+                for line in self.clue_text(dirnum, maxw):
                     self.clue_layout[clue_top+y] = clue
-                    clipdraw(scr, clue_top+y, clue_left+1, line, attr)
+                    self.paint(scr, 'clues', clue_top+y, clue_left+1, line, attr)
                     y += 1
 
 
-        clueh = self.nrows//2-1
-        draw_clues(clue_top, self.acr_clues, cursor_across, clueh)
-        draw_clues(clue_top+clueh+2, self.down_clues, cursor_down, clueh)
-
-        self.draw_notes(scr)
-        self.draw_solvers(scr)
+        self.visible_clues.clear()
+        clueh = self.view_rows//2-1
+        draw_clues(clue_top, self.acrosses, cursor_across, clueh)
+        draw_clues(clue_top+clueh+2, self.downs, cursor_down, clueh)
+
+    def clue_text(self, dirnum, maxw):
+        'Return the lines of the clue at *dirnum* and its current guess, wrapped to *maxw* and prefixed with *dirnum*.'
+        cached = self.clue_lines.get(dirnum)
+        if cached and cached[0] == maxw:
+            return cached[1]
+
+        clue = self.clues[dirnum]
+        guess = ''.join([self.grid.get(y, x) for x, y in clue.coords])
+        dnw = len(dirnum)+2
+        lines = []
+        import textwrap
+        for j, line in enumerate(textwrap.wrap(clue.clue + f' [{guess}]', width=maxw)):
+            prefix = f'{dirnum}. ' if j == 0 else ' '*dnw
+            lines.append(prefix + line + ' '*(maxw-len(line)))
+        self.clue_lines[dirnum] = (maxw, lines)
+        return lines
 
     def draw_solvers(self, scr):
         y = 0
         x = 0
         colnames = []
         nameattrs = [
-            ('%s (%d%%)' % (user, sum(1 for (x,y), r in self.guesser.items() if r.get('user', '') == user and self.cell(y, x) != UNFILLED)*100/self.ncells), getattr(opt, color+'attr'))
+            ('%s (%d%%)' % (user, self.nfilled[user]*100/self.ncells), getattr(opt, color+'attr'))
                 for user, color in self.guessercolors.items()
         ]
 
         for name, attr in nameattrs:
             colnames.append(name)
-            clipdraw(scr, grid_bottom+y+1, grid_left+x, name, attr)
+            self.paint(scr, 'solvers', grid_bottom+y+1, grid_left+x, name, attr)
             y += 1
             if y >= self.max_solver_rows:
                 y = 0
@@ -472,6 +847,7 @@ class Crossword:
         h, w = scr.getmaxyx()
         notes = self.notes.get(self.curr_dirnum, None)
         if not notes: return
+        import textwrap
         curr_y = grid_bottom+self.max_solver_rows+2
 
         maxnamew = max(len(x['user']) for x in notes)
@@ -482,14 +858,18 @@ class Crossword:
         if self.starting_note > len(notes)-2:
             self.starting_note = len(notes)-2
         for note in notes[self.starting_note:]:
+            if curr_y >= h-1:  # the help line
+                break
             localtime = time.strftime("%b %2d  %H:%M", time.localtime(note.get("time", time.time())))
             username = f' {localtime} <{note["user"]}> '
             attr = self.get_user_attr(note["user"])
-            clipdraw(scr, curr_y, grid_left, username, attr)
+            self.paint(scr, 'notes', curr_y, grid_left, username, attr)
             lines = textwrap.wrap(note['note'], width=maxw)
             for j, line in enumerate(lines):
+                if curr_y >= h-1:
+                    break
                 line = ' ' + line + ' '*(maxw-len(line)+1)
-                clipdraw(scr, curr_y, grid_left+17+maxnamew, line, attr)
+                self.paint(scr, 'notes', curr_y, grid_left+17+maxnamew, line, attr)
                 curr_y += 1
             if curr_y >= h-2:
                 break
@@ -501,7 +881,7 @@ class Crossword:
             key = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMN"[i]
             self.hotkeys[key] = k
 
-            y = grid_top+self.nrows+i+1
+            y = grid_bottom+i+1
             if y < h-1:
                 clipdraw(scr, y, 3, key, 0)
                 clipdraw(scr, y, 5, k, 0)
@@ -545,36 +925,30 @@ class Crossword:
 
             for clue in self.acr_clues.values():
                 dirnum = f'{clue.dir}{clue.num}'
-                guess = ''.join([self.grid[r][c] for r, c in self.clues[dirnum][-1]])
+                guess = ''.join([self.grid.get(y, x) for x, y in self.clues[dirnum][-1]])
                 fp.write(f'{dirnum}. {clue.clue} ~ {guess}\n')
             fp.write('\n')
 
             for clue in self.down_clues.values():
                 dirnum = f'{clue.dir}{clue.num}'
-                guess = ''.join([self.grid[r][c] for r, c in self.clues[dirnum][-1]])
+                guess = ''.join([self.grid.get(y, x) for x, y in self.clues[dirnum][-1]])
                 fp.write(f'{dirnum}. {clue.clue} ~ {guess}\n')
 
     def findCoords(self, dirnum, index=0):
         'Return (y, x) grid coords for given *index* into answer at *dirnum*.'
-        coords = [(y, x)
-                for (y, x), clues in self.pos.items()
-                for clue in clues
-                if clue.dir == dirnum[0] and str(clue.num) == dirnum[1:]]
-        if dirnum[0] == 'A':
-            return sorted(coords)[index]
-        else:
-            return sorted(coords, key=lambda c: c[1])[index]
+        x, y = self.clues[dirnum].coords[index]
+        return y, x
 
     def setAtCursor(self, ch, user=None):
         self.setAt(self.cursor_x, self.cursor_y, ch, user=user)
 
     def setAt(self, cursor_x, cursor_y, ch, user=None):
         self.update_rebus(ch, cursor_x, cursor_y)
-        if self.grid[cursor_y][cursor_x] == ch:
+        if self.grid.get(cursor_y, cursor_x) == ch:
             return
 
         self.writeEntry(x=cursor_x, y=cursor_y, ch=ch, user=user)
-        self.grid[cursor_y][cursor_x] = ch
+        self.set_cell(cursor_x, cursor_y, ch)
         prevrow = self.guesser[(cursor_x,cursor_y)]
         if not prevrow:
             prevrow = dict(xdid=self.xdid, x=cursor_x, y=cursor_y, ch=UNFILLED)
@@ -582,30 +956,101 @@ class Crossword:
 
     def writeEntry(self, **data):
         if not data.get('user', None):
-            data['user'] = os.getenv('USER', getpass.getuser())
+            data['user'] = getuser()
 
         if not data.get('xdid', None):
             data['xdid'] = self.xdid
 
-        with open(self.guessfn, 'a') as fp:
-            fp.write(json.dumps(data) + '\n')
+        self.guesslog.write(data)
+
+    def reset_guesses(self):
+        'Forget all replayed guesses and notes, so the next replay_guesses starts from the beginning of the log.'
+        self.clear()
+        self.guesser = defaultdict(dict)
+        self.guessercolors = defaultdict(str)
+        self.rebus = {}
+        self.notes = defaultdict(list)
+        self.lastpos = 0
+        self.rescan = True
+        self.nreplayed = 0  # rows replayed since the last checkpoint
 
     def replay_guesses(self):
-        if not os.path.exists(self.guessfn):
-            return
+        'Replay rows appended to the guesses log since the last replay, if it has changed.  Return True if anything was replayed.'
+        if self.guesswatcher is None:
+            self.guesswatcher = LogWatcher(self.guessfn)
+
+        if not self.guesswatcher.changed() and not self.rescan:
+            return False
+        self.rescan = False
 
-        with open(self.guessfn) as fp:
-            fp.seek(self.lastpos)
-            for line in fp.read().splitlines():
-                d = json.loads(line)
-                if 'note' in d:
-                    self.replay_note(d)
-                    continue
-                self.replay_guess(d)
-            self.lastpos = fp.tell()
+        if not self.lastpos:
+            ckpt = read_checkpoint(self.guessfn)
+            if ckpt and ckpt.get('xdid') == self.xdid:
+                self.restore_checkpoint(ckpt)
+
+        try:
+            with open(self.guessfn, 'rb') as fp:
+                rewritten = os.fstat(fp.fileno()).st_size < self.lastpos
+                if rewritten:  # e.g. by xdcompact.py
+                    self.reset_guesses()
+                    self.rescan = False
+                fp.seek(self.lastpos)
+                data = fp.read()
+        except FileNotFoundError:  # GuessLog creates it on the first guess
+            return False
+
+        # a row still being written has no newline yet; leave it for the next replay
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            d = json.loads(line)
+            self.nreplayed += 1
+            if 'note' in d:
+                self.replay_note(d)
+                continue
+            self.replay_guess(d)
+        self.lastpos += end
+
+        if self.nreplayed >= checkpoint_rows:
+            write_checkpoint(self.guessfn, self.checkpoint())
+            self.nreplayed = 0
+
+        return end > 0 or rewritten
+
+    def checkpoint(self):
+        'Return the replayed state of the guesses log up to lastpos, for write_checkpoint.'
+        return dict(
+            xdid=self.xdid,
+            offset=self.lastpos,
+            grid=[self.grid.cells.decode('latin-1'), list(self.grid.rebus.items())],
+            guesser=[r for r in self.guesser.values() if r],
+            guessercolors=list(self.guessercolors.items()),
+            rebus={word: [symbol, sorted(coords)] for word, (symbol, coords) in self.rebus.items()},
+            notes=self.notes,
+        )
+
+    def restore_checkpoint(self, ckpt):
+        'Restore the state saved by checkpoint(), so replay can continue from its offset.'
+        cells, rebus = ckpt['grid']
+        cells = cells.encode('latin-1')
+        if len(cells) != self.nrows*self.ncols:
+            return
 
-        if not os.path.exists(self.guessfn):
-            Path(self.guessfn).touch(0o777)
+        self.grid = Grid.frombytes(self.nrows, self.ncols, cells, rebus)
+        self.recount()
+        self.clue_lines.clear()
+        self.minimap_lines.clear()
+        self.invalidate()
+        self.guesser = defaultdict(dict, {(r['x'], r['y']): r for r in ckpt['guesser']})
+        self.nfilled = defaultdict(int)
+        for (x, y), r in self.guesser.items():
+            if self.grid.get(y, x) not in '.#':
+                self.nfilled[r.get('user', '')] += 1
+        self.guessercolors = defaultdict(str, ckpt['guessercolors'])
+        self.rebus = {word: (symbol, set(map(tuple, coords))) for word, (symbol, coords) in ckpt['rebus'].items()}
+        self.notes = defaultdict(list, ckpt['notes'])
+        self.lastpos = ckpt['offset']
 
     @property
     def rebus_chars(self):
@@ -617,8 +1062,8 @@ class Crossword:
 
         r = r.upper()
 
-        # check self.grid[y][x] already has a rebus, remove it from self.rebus
-        oldch = self.grid[y][x].upper()
+        # check grid cell (y, x) already has a rebus, remove it from self.rebus
+        oldch = self.grid.get(y, x).upper()
         if oldch in self.rebus:
             self.rebus[oldch][1].remove((x, y))
             # if position set is empty, remove rebus index
@@ -641,9 +1086,12 @@ class Crossword:
 
         self.update_rebus(ch, x, y)
 
-        self.grid[y][x] = ch
+        self.set_cell(x, y, ch)
 
         user = d.get('user', '')
+        if ch not in '.#':  # the filled cell now counts for this guesser
+            self.nfilled[self.guesser[(x,y)].get('user', '')] -= 1
+            self.nfilled[user] += 1
         self.guesser[(x,y)] = d
         if user and user not in self.guessercolors:
             if len(self.guessercolors) >= 13:
@@ -653,12 +1101,13 @@ class Crossword:
 
     def replay_note(self, d):
         self.notes[d['dirnum']].append(d)
+        self.dirty_panels.update(('clues', 'notes'))
 
     # Returns the coordinates of the first square of the current + kth across guess
     def seekAcross(self, k):
         curr_clue = self.cross[(self.cursor_x, self.cursor_y)].across
         if not curr_clue: return (self.cursor_x, self.cursor_y)
-        index = self.acrosses.index(f'{curr_clue.dir}{curr_clue.num}')
+        index = self.clue_ordinal[f'{curr_clue.dir}{curr_clue.num}']
         next_dirnum = self.acrosses[(index + k) % len(self.acrosses)]
         return self.clues[next_dirnum].coords[0]
 
@@ -666,54 +1115,108 @@ class Crossword:
     def seekDown(self, k):
         curr_clue = self.cross[(self.cursor_x, self.cursor_y)].down
         if not curr_clue: return (self.cursor_x, self.cursor_y)
-        index = self.downs.index(f'{curr_clue.dir}{curr_clue.num}')
+        index = self.clue_ordinal[f'{curr_clue.dir}{curr_clue.num}']
         next_dirnum = self.downs[(index + k) % len(self.downs)]
         return self.clues[next_dirnum].coords[0]
 
 
 class CrosswordPlayer:
+    max_loaded = 8  # number of recently played puzzles to keep parsed
+
     def __init__(self, crossword_paths):
-        from collections import deque
         self.statuses = []
-        self.crossword_paths = deque([Crossword(xd) for xd in crossword_paths])
+        self.crossword_paths = deque(crossword_paths)
+        self.loaded = OrderedDict()  # path -> Crossword, least recently played first
         self.n = 0
         self.xd = None
         self.startt = time.time()
         self.lastpos = 0
         self.animmgr = AnimationMgr()
-        self.animmgr.load('completed', open(resource_filename(__name__, 'ddw/completed.ddw')))
+        self.animmgr.load_file('completed', resource_path('ddw/completed.ddw'))
+        self.animmgr.tick(self.startt, 1)  # for the clock on the bottom line
         self.completed = False
+        self.drawn_lines = {}  # (y, x) -> width drawn by draw_line since the last full repaint
         self.next_crossword()
 
 
+    def load_crossword(self, path):
+        'Return the Crossword for *path*, parsing it only if it was not played recently.'
+        xd = self.loaded.pop(path, None)
+        if xd is None:
+            xd = Crossword(path)
+        self.loaded[path] = xd
+        while len(self.loaded) > self.max_loaded:
+            path, evicted = self.loaded.popitem(last=False)
+            evicted.close()
+        return xd
+
     def next_crossword(self):
-        self.xd = self.crossword_paths.popleft()
-        self.crossword_paths.append(self.xd)
-        self.xd.clear()
-        self.xd.lastpos = 0
-        self.xd.notes = defaultdict(list)
+        for i in range(len(self.crossword_paths)):
+            path = self.crossword_paths.popleft()
+            self.crossword_paths.append(path)
+            try:
+                self.xd = self.load_crossword(path)
+                break
+            except Exception as e:
+                if i == len(self.crossword_paths)-1:
+                    raise
+                self.status(f'skipped {path}: {e}')
+
+        self.xd.reset_guesses()
         self.xd.replay_guesses()
+        self.xd.invalidate()
 
     def status(self, s):
         self.statuses.append(s)
 
-    def play_one(self, scr, xd):
+    def clock(self, now):
+        'Return the elapsed time as shown on the bottom line, which changes at most once a second.'
+        secs = now-self.startt
+        timestr = '% 2d' % (secs//3600) if secs > 3600 else '  '
+        timestr += ' ' if int(secs) % 5 == 0 else ':'
+        timestr += '%02d' % ((secs % 3600)//60)
+        return timestr
+
+    def draw(self, scr, xd):
+        'Draw what changed on the screen.  Return the time the next animation frame or clock tick is due, or None.'
         h, w = scr.getmaxyx()
+
+        # if crossword is complete, check correct cell count, before drawing
+        # the grid (underlined if checkable) and the status line
+        if xd.nsolved == xd.ncells:
+            correct = xd.grade()
+
+            if correct == xd.ncells:
+                if not self.completed:
+                    xd.mark_done()
+                    self.animmgr.trigger('completed', loop=True, x=1, y=h-3)
+                    self.status('puzzle complete! nicely done')
+                    self.completed = True
+            else:
+                xd.checkable=True
+                self.status(f'no cigar! {xd.ncells - correct} are wrong')
+        else:
+            xd.checkable=False
+
+        now = time.time()
+        repainted = True
         try:
-            scr.erase()
-            xd.draw(scr)
+            xd.damage(self.animmgr.erase(scr, now))  # animation frames that changed
+            if opt.hotkeys:  # does not keep track of what it drew
+                xd.invalidate()
+            repainted = xd.draw(scr)
+            if repainted:
+                self.drawn_lines.clear()
         except Exception:
             scr.clear()
             self.next_crossword()
+            self.drawn_lines.clear()
         if self.statuses:
-            clipdraw(scr, h-2, clue_left, self.statuses[-1], 0)
+            self.draw_line(scr, h-2, clue_left, self.statuses[-1], 0)
         solvedamt = '%d/%d' % (xd.nsolved, xd.ncells)
 
         # draw time on bottom
-        secs = time.time()-self.startt
-        timestr = '% 2d' % (secs//3600) if secs > 3600 else '  '
-        timestr += ' ' if int(secs) % 5 == 0 else ':'
-        timestr += '%02d' % ((secs % 3600)//60)
+        timestr = self.clock(now)
 
         h, w = scr.getmaxyx()
 
@@ -723,41 +1226,35 @@ class CrosswordPlayer:
             botline = [timestr, solvedamt] + list("Tab direction | ^Q quit | ^N next puzzle | ^Z undo | ^Y note | ^R rebus".split(' | '))
 
         # draw helpstr
-        clipdraw(scr, h-1, 4, opt.sepch.join(botline), opt.helpattr)
+        self.draw_line(scr, h-1, 4, opt.sepch.join(botline), opt.helpattr)
 
         if opt.hotkeys:
             xd.draw_hotkeys(scr)
             clipdraw(scr, 1, w-20, f'{h}x{w}', 0)
 
-        now = time.time()
-        nextt = self.animmgr.draw(scr, now)
-        timeout = int((nextt-now)*1000)
-        if timeout < 0:
-            scr.timeout(1)
-        else:
-            scr.timeout(timeout)
+        self.animmgr.draw(scr, now, redraw=repainted)
 
-        # if crossword is complete, check correct cell count
-        if xd.nsolved == xd.ncells:
-            correct = xd.grade()
+        return self.animmgr.deadline()
 
-            if correct == xd.ncells:
-                if not self.completed:
-                    xd.mark_done()
-                    self.animmgr.trigger('completed', loop=True, x=1, y=h-3)
-                    self.status('puzzle complete! nicely done')
-                    self.completed = True
-            else:
-                self.xd.checkable=True
-                self.status(f'no cigar! {xd.ncells - correct} are wrong')
-        else:
-            self.xd.checkable=False
+    def draw_line(self, scr, y, x, s, attr):
+        'clipdraw *s* at (y, x), first clearing what the last call drew there, as the screen is not erased between draws.'
+        oldw = self.drawn_lines.get((y, x), 0)
+        if oldw:
+            scr.addstr(y, x, ' '*oldw, 0)
+        h, w = scr.getmaxyx()
+        self.drawn_lines[(y, x)] = min(clipdraw(scr, y, x, s, attr), w-x-1)  # a truncated string reports one more than it drew
 
-        k = scr.getkeystroke()
+    def handle_key(self, scr, xd, k):
+        'Act on keystroke *k*.  Return True to quit.'
+        h, w = scr.getmaxyx()
         if k == '^Q': return True
         if not k: return False
-        if k == 'KEY_RESIZE': h, w = scr.getmaxyx()
-        if k == '^L': scr.clear()
+        if k == 'KEY_RESIZE':
+            h, w = scr.getmaxyx()
+            xd.invalidate()
+        if k == '^L':
+            scr.clear()
+            xd.invalidate()
         if k == '^N':
             self.next_crossword()
             self.statuses=[]
@@ -766,6 +1263,7 @@ class CrosswordPlayer:
             clipdraw(scr, h-2, 1, 'rebus:', opt.fgattr)
             r = editline(scr, h-2, 8, w-1)
             xd.setAtCursor(r.upper())
+            xd.invalidate()
 
         if k == '^Y':
             if self.xd.curr_dirnum:
@@ -780,6 +1278,7 @@ class CrosswordPlayer:
             else:
                 while not scr.getkeystroke():
                     clipdraw(scr, h-2, 1, 'couldn\'t find a clue here! try changing direction', opt.fgattr)
+            xd.invalidate()
 
         if opt.hotkeys:
             clipdraw(scr, 0, w-20, k, 0)
@@ -789,9 +1288,9 @@ class CrosswordPlayer:
         if k == 'KEY_MOUSE':
             devid, x, y, z, bstate = curses.getmouse()
             if grid_top <= y < grid_bottom and grid_left <= x < grid_right:
-                x = (x-grid_left)//2
-                y = y-grid_top
-                if xd.grid[y][x] != '#':
+                x = (x-grid_left)//2 + xd.minx+1
+                y = y-grid_top + xd.miny
+                if xd.grid.get(y, x) != '#':
                     xd.cursor_x = x
                     xd.cursor_y = y
             elif y in xd.clue_layout:
@@ -826,15 +1325,16 @@ class CrosswordPlayer:
         #elif k == '^S': xd.mark_done(); self.status('puzzle submitted!')
         elif k == '^X':
             opt.hotkeys = not opt.hotkeys
+            xd.invalidate()
             return
         elif k == '^Z':
             if not xd.undos:
                 self.status('nothing to undo')
                 return
-            with open(xd.guessfn, 'a') as fp:
+            with xd.guesslog.batch():
                 while xd.undos:
                     r = xd.undos.pop()
-                    fp.write(json.dumps(r) + '\n')
+                    xd.guesslog.write(r)
                 xd.cursor_x = r['x']
                 xd.cursor_y = r['y']
 
@@ -849,19 +1349,65 @@ class CrosswordPlayer:
         elif k == 'KEY_F(2)':  # solve puzzle
             xd.solve()
         elif k == '@':  # circle letter
-            coord = (xd.cursor_y, xd.cursor_x)
-            if coord in xd.circled:
-                xd.circled.remove(coord)
-            else:
-                xd.circled.append(coord)
+            xd.toggle_circled(xd.cursor_y, xd.cursor_x)
         elif k in xd.rebus_chars:
             xd.setAtCursor(xd.rebus_chars[k])
         elif opt.hotkeys and k in xd.hotkeys:
             opt.cycle(xd.hotkeys[k])
+            xd.invalidate()
         elif k.upper() in string.ascii_uppercase:
             xd.setAtCursor(k.upper())
             xd.cursorMove(+1)
 
+    def handle_keys(self, scr, keys):
+        'Act on several keystrokes, writing the guesses they make to the log in one batch.  Return True to quit.'
+        try:
+            with self.xd.guesslog.batch():
+                for k in keys:
+                    try:
+                        if self.handle_key(scr, self.xd, k):
+                            return True
+                    except PermissionError as e:
+                        self.status('puzzle submitted! submitted puzzles cannot be changed')
+        except PermissionError as e:
+            self.status('puzzle submitted! submitted puzzles cannot be changed')
+
+    def handle_input(self, scr):
+        '''Act on all keystrokes already typed (e.g. pasted), without waiting or
+        redrawing in between.  A key that opens a prompt is handled on its own
+        after the screen is brought up to date, as the prompt is drawn over it
+        and reads the keys typed after it.
+        Return True to quit, False if any keys were handled, or None if none were pending.'''
+        handled = None
+        keys = []
+        while True:
+            scr.timeout(0)
+            k = scr.getkeystroke()
+            scr.timeout(-1)
+            if k and k not in PROMPT_KEYS:
+                keys.append(k)
+                continue
+
+            if keys:
+                handled = False
+                if self.handle_keys(scr, keys):
+                    return True
+                keys = []
+
+            if not k:
+                return handled
+
+            self.draw(scr, self.xd)
+            scr.refresh()
+            handled = False
+            if self.handle_keys(scr, [k]):
+                return True
+
+    def play_one(self, scr, xd):
+        'Draw the screen, then wait for and act on one keystroke.  Return True to quit.'
+        self.draw(scr, xd)
+        return self.handle_key(scr, xd, scr.getkeystroke())
+
 
 def init_curses(scr):
     curses.use_default_colors()
@@ -885,11 +1431,46 @@ def main_player(scr, *args):
     opt.scr = scr
 
     plyr = CrosswordPlayer(args)
+    scr.colors.warn = plyr.status
+
+    # Sleep until a keystroke, a change to the guesses log, or the next
+    # animation frame or clock tick, and redraw only if one of them needs it.
+    # curses handles SIGWINCH itself, so KEY_RESIZE is only seen on the next
+    # wakeup; the clock ticks every second, which bounds that delay, and also
+    # that of guesses written from other hosts, which inotify does not see.
+    sel = selectors.DefaultSelector()
+    sel.register(sys.stdin, selectors.EVENT_READ)
+    watcher = None  # guesses log watcher registered with sel
+    scr.timeout(-1)  # the rebus and note prompts block for keys
+
+    redraw = True
+    nextt = None  # time the next animation frame or clock tick is due
     while True:
-        try:
-            if plyr.play_one(scr, plyr.xd):
-                break
-        except PermissionError as e:
-            plyr.status('puzzle submitted! submitted puzzles cannot be changed')
+        now = time.time()
+        if redraw or (nextt is not None and now >= nextt):
+            nextt = plyr.draw(scr, plyr.xd)
+            scr.refresh()
+            redraw = False
+
+        if plyr.xd.guesswatcher is not watcher:
+            if watcher is not None and watcher.fileno() is not None:
+                sel.unregister(watcher.fileno())
+            watcher = plyr.xd.guesswatcher
+            if watcher is not None and watcher.fileno() is not None:
+                sel.register(watcher.fileno(), selectors.EVENT_READ)
+
+        now = time.time()
+        deadline = nextt
+        if watcher is None or watcher.fileno() is None:
+            deadline = now+poll_interval if deadline is None else min(deadline, now+poll_interval)
+        sel.select(None if deadline is None else max(0, deadline-now))
+
+        handled = plyr.handle_input(scr)
+        if handled:
+            return
+        if handled is not None:
+            redraw = True
 
-        plyr.xd.replay_guesses()  # from other player(s)
+        if plyr.xd.replay_guesses():  # from other player(s)
+            redraw = True
+        plyr.xd.guesslog.sync_if_due()  # the last guesses before a pause
@@ -0,0 +1,24 @@
+'''
+Replacing files atomically, so readers see either the old or the new contents.
+'''
+
+from contextlib import contextmanager
+import os
+
+
+@contextmanager
+def atomic_write(path, mode='w', **kwargs):
+    '''Yield a temporary file in the same directory as *path*, opened with
+    *mode*, and replace *path* with it when the block exits.  If the block
+    raises, remove the temporary file and leave *path* as it was.'''
+    tmpfn = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with open(tmpfn, mode, **kwargs) as fp:
+            yield fp
+        os.replace(tmpfn, path)
+    except BaseException:
+        try:
+            os.unlink(tmpfn)
+        except OSError:
+            pass
+        raise
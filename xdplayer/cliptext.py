@@ -1,6 +1,6 @@
+from collections import OrderedDict
 from contextlib import suppress
 import curses
-import functools
 import unicodedata
 import sys
 
@@ -11,6 +11,8 @@ disp_oddspace = '\u00b7' # displayable character for odd whitespace
 
 disp_column_fill = ' '
 
+clip_cache_chars = 1 << 20  # total length of the strings whose clipping and width are cached
+
 class EscapeException(BaseException):
     'Inherits from BaseException to avoid "except Exception" clauses. Do not use a blanket "except:" or the task will be uncancelable.'
     pass
@@ -58,6 +60,36 @@ def wcwidth(cc, ambig=1):
             return 1
         return 0
 
+class ClipCache:
+    '''Least recently used cache keyed by tuples starting with a string, and
+    bounded by the total length of those strings rather than their number,
+    so a long session of one-off clues and notes keeps it at a fixed size.'''
+    def __init__(self, maxchars):
+        self.maxchars = maxchars
+        self.nchars = 0
+        self.entries = OrderedDict()  # key -> value, least recently used first
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        n = len(key[0])
+        if n <= self.maxchars:
+            self.entries[key] = value
+            self.nchars += n
+            while self.nchars > self.maxchars:
+                oldkey, _ = self.entries.popitem(last=False)
+                self.nchars -= len(oldkey[0])
+        return value
+
+
+char_widths = {}  # char -> wcwidth(char, disp_ambig_width), filled in as chars are seen
+char_kinds = {}  # char -> which substitute _clipstr displays it as; see _dispkind
+
+
 # editline helpers
 
 class EnableCursor:
@@ -211,36 +243,58 @@ def editline(scr, y, x, w, i=0, attr=curses.A_NORMAL, value='', fillchar=' ', tr
 
     return type(value)(v)
 
-@functools.lru_cache(maxsize=100000)
-def _dispch(c, oddspacech=None, combch=None, modch=None):
+def _dispkind(c):
+    'Return "modch", "oddspacech" or "combch" if *c* is displayed as that substitute (one column wide), or "".'
     ccat = unicodedata.category(c)
     if ccat in ['Mn', 'Sk', 'Lm']:
-        if unicodedata.name(c).startswith('MODIFIER'):
-            return modch, 1
+        if unicodedata.name(c, '').startswith('MODIFIER'):
+            return 'modch'
     elif c != ' ' and ccat in ('Cc', 'Zs', 'Zl', 'Cs'):  # control char, space, line sep, surrogate
-        return oddspacech, 1
+        return 'oddspacech'
     elif c in ZERO_WIDTH_CF:
-        return combch, 1
-
-    return c, dispwidth(c)
+        return 'combch'
+    return ''
 
 
-@functools.lru_cache(maxsize=100000)
 def _clipstr(s, dispw, trunch='', oddspacech='', combch='', modch=''):
     '''Return clipped string and width in terminal display characters.
     Note: width may differ from len(s) if East Asian chars are 'fullwidth'.'''
+    if s.isascii() and s.isprintable():
+        return _clipascii(s, dispw, _charwidth(trunch) if len(trunch) == 1 else dispwidth(trunch), trunch)
+
+    key = (s, dispw, trunch, oddspacech, combch, modch)
+    ret = _clipstr_cache.get(key)
+    if ret is None:
+        ret = _clipstr_cache.put(key, _clipchars(s, dispw, trunch, dict(modch=modch, oddspacech=oddspacech, combch=combch)))
+    return ret
+
+
+def _clipascii(s, dispw, trunchlen, trunch):
+    'Return what _clipchars() would for a string of printable ASCII, all one column wide, by slicing.'
+    limit = dispw-trunchlen+1
+    if not dispw or len(s) <= limit:
+        return s, len(s)
+    n = max(1, limit+1)  # characters read before it stopped
+    return s[:max(0, n-2)] + trunch, n+trunchlen
+
+
+def _clipchars(s, dispw, trunch, substs):
+    'Clip *s* character by character, displaying each of _dispkind() as its non-empty substitute in *substs*.'
     w = 0
     ret = ''
 
     trunchlen = dispwidth(trunch)
     for c in s:
-        newc, chlen = _dispch(c, oddspacech=oddspacech, combch=combch, modch=modch)
-        if newc:
+        kind = char_kinds.get(c)
+        if kind is None:
+            kind = char_kinds[c] = _dispkind(c)
+        newc = substs[kind] if kind else c
+        if kind and newc:
             ret += newc
-            w += chlen
+            w += 1
         else:
             ret += c
-            w += dispwidth(c)
+            w += _charwidth(c)
 
         if dispw and w > dispw-trunchlen+1:
             ret = ret[:-2] + trunch # replace final char with ellipsis
@@ -257,18 +311,34 @@ def clipstr(s, dispw, truncator=None, oddspace=None):
             modch='',
             combch='')
 
-@functools.lru_cache(maxsize=100000)
 def dispwidth(ss, maxwidth=None):
     'Return display width of string, according to unicodedata width and options.disp_ambig_width.'
-    w = 0
-
-    for cc in ss:
-        w += wcwidth(cc, disp_ambig_width)
-        if maxwidth and w > maxwidth:
-            break
+    if ss.isascii() and ss.isprintable():  # one column per character
+        return min(len(ss), maxwidth+1) if maxwidth else len(ss)
+
+    key = (ss, maxwidth)
+    w = _dispwidth_cache.get(key)
+    if w is None:
+        w = 0
+        for cc in ss:
+            w += _charwidth(cc)
+            if maxwidth and w > maxwidth:
+                break
+        _dispwidth_cache.put(key, w)
     return w
 
 
+def _charwidth(c):
+    cw = char_widths.get(c)
+    if cw is None:
+        cw = char_widths[c] = wcwidth(c, disp_ambig_width)
+    return cw
+
+
+_clipstr_cache = ClipCache(clip_cache_chars)
+_dispwidth_cache = ClipCache(clip_cache_chars)
+
+
 def clipdraw(scr, y, x, s, attr, w=None, clear=True, rtl=False, **kwargs):
     'Draw string `s` at (y,x)-(y,x+w) with curses attr, clipping with ellipsis char.  if rtl, draw inside (x-w, x).  If *clear*, clear whole editing area before displaying. Returns width drawn (max of w).'
     if scr:
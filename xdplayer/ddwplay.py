@@ -1,19 +1,44 @@
+from bisect import bisect_right
 from collections import defaultdict
+import heapq
+import itertools
 import json
+import os
 import time
 
+from .cliptext import dispwidth
 
-class AttrDict(dict):
-    def __getattr__(self, k):
-        return self.get(k, '')
-    def __setattr__(self, k, v):
-        self[k] = v
+
+class Row:
+    '''One row of a .ddw file, with only the fields the player uses.  Missing
+    fields read as "" (or 0 for numbers), like the JSON rows they come from.'''
+    __slots__ = ('id', 'type', 'text', 'color', 'frame', 'group', 'ref', 'x', 'y', 'duration_ms', 'rows')
+
+    def __init__(self, d=None):
+        self.id = self.type = self.text = self.color = self.frame = self.group = self.ref = ''
+        self.x = self.y = self.duration_ms = 0
+        self.rows = None
+        if d:
+            self.update(d)
+
+    def update(self, d):
+        'Set the fields in dict *d*; other keys are dropped.'
+        for k, v in d.items():
+            if k in Row.fields:
+                setattr(self, k, v)
+
+
+Row.fields = frozenset(Row.__slots__)
 
 
 class Animation:
     def __init__(self, fp):
-        self.frames = defaultdict(AttrDict)  # frame.id -> frame row
-        self.groups = defaultdict(AttrDict)  # group.id -> group row
+        self.frames = defaultdict(Row)  # frame.id -> frame row
+        self.groups = defaultdict(Row)  # group.id -> group row
+        self.ends = []  # ms from the start at which each frame with a duration ends, ascending
+        self.ops = []  # [(y, x, text, color)] to draw each frame in self.ends
+        self.colors = None  # scr.colors that drawops was resolved with
+        self.drawops = []  # self.ops with colors resolved to attrs
         self.load_from(fp)
 
     def iterdeep(self, rows, x=0, y=0, parents=None):
@@ -31,11 +56,12 @@ class Animation:
 
     def load_from(self, fp):
         for line in fp.readlines():
-            r = AttrDict(json.loads(line))
+            d = json.loads(line)
+            r = Row(d)
             if r.type == 'frame':
-                self.frames[r.id].update(r)
+                self.frames[r.id].update(d)
             elif r.type == 'group':
-                self.groups[r.id].update(r)
+                self.groups[r.id].update(d)
 
             f = self.frames[r.frame]
             if not f.rows:
@@ -43,48 +69,158 @@ class Animation:
             else:
                 f.rows.append(r)
 
-        self.total_ms = 0
-        if self.frames:
-            self.total_ms = sum(f.duration_ms or 0 for f in self.frames.values())
+        self.compile()
 
-    def draw(self, scr, t, *args, x=0, y=0, loop=False, **kwargs):
-        ms = int(t*1000)
-        if loop:
-            ms %= self.total_ms
+    def compile(self):
+        'Flatten each frame into draw ops, and the frame durations into a timeline.'
+        self.ends = []
+        self.ops = []
+        self.colors = None
+        t = 0
         for f in self.frames.values():
-            ms -= int(f.duration_ms or 0)
-            if ms < 0:
-                for r, dx, dy, _ in self.iterdeep(f.rows):
-                    scr.addstr(y+dy, x+dx, r.text, scr.colors[r.color])
+            duration = int(f.duration_ms or 0)
+            if duration <= 0:  # never shown
+                continue
+            t += duration
+            self.ends.append(t)
+            self.ops.append([(dy, dx, r.text, r.color) for r, dx, dy, _ in self.iterdeep(f.rows or [])])
+        self.total_ms = t
+
+    def draw(self, scr, t, *args, x=0, y=0, loop=False, spans=None, **kwargs):
+        '''Draw the frame at *t* seconds from the start with its top left at (y, x),
+        appending the (y, x, width) of each string drawn to *spans* if given.
+        Return the time from the start when the next frame is due, or None if
+        the animation is over.'''
+        ms = int(t*1000)
+        cyclestart = 0
+        if loop and self.total_ms:
+            cyclestart = ms - ms % self.total_ms
+        i = bisect_right(self.ends, ms - cyclestart)
+        if i >= len(self.ends):
+            return None
+
+        if self.colors is not scr.colors:
+            self.colors = scr.colors
+            self.drawops = [[(dy, dx, text, scr.colors[color]) for dy, dx, text, color in ops] for ops in self.ops]
+
+        for dy, dx, text, attr in self.drawops[i]:
+            scr.addstr(y+dy, x+dx, text, attr)
+            if spans is not None:
+                spans.append((y+dy, x+dx, dispwidth(text)))
+
+        return (cyclestart + self.ends[i])/1000
+
 
-                return -ms/1000
+animation_cache = {}  # path -> ((size, mtime), Animation), shared by every AnimationMgr in the process
 
-        if loop:
-            return -ms/1000
+
+def load_animation(fn):
+    'Return the Animation in the .ddw file *fn*, parsed only the first time or after the file changes.'
+    st = os.stat(fn)
+    key = (st.st_size, st.st_mtime_ns)
+    cached = animation_cache.get(fn)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(fn, encoding='utf-8') as fp:
+        anim = Animation(fp)
+    animation_cache[fn] = (key, anim)
+    return anim
+
+
+class Playing:
+    'An Animation triggered on screen, and what its current frame drew there.'
+    __slots__ = ('startt', 'anim', 'args', 'kwargs', 'spans', 'nextt')
+
+    def __init__(self, startt, anim, args, kwargs):
+        self.startt = startt
+        self.anim = anim
+        self.args = args
+        self.kwargs = kwargs
+        self.spans = []  # (y, x, width) drawn by the current frame
+        self.nextt = 0  # as returned by the last anim.draw
+
+
+class Tick:
+    'A wakeup every *interval* seconds from *startt*, for something that changes on its own, like a clock.'
+    __slots__ = ('startt', 'interval')
+
+    def __init__(self, startt, interval):
+        self.startt = startt
+        self.interval = interval
+
+    def after(self, now):
+        'Return the first tick after *now*.'
+        return self.startt + ((now-self.startt)//self.interval + 1)*self.interval
 
 
 class AnimationMgr:
+    '''Schedules animation frames and ticks on a heap of deadlines.
+
+    Each draw is in two phases around drawing everything else: erase() pops
+    what is due and erases the frames those animations drew, then draw()
+    draws their next frames.  Animations whose frame has not changed are
+    left alone.
+    '''
     def __init__(self):
         self.library = {}  # animation name -> Animation
-        self.active = []  # list of (start_time, Animation, args, kwargs)
+        self.active = {}  # Playing -> None, in the order they were triggered
+        self.heap = []  # (deadline, seq, Playing or Tick)
+        self.seq = itertools.count()  # breaks ties between equal deadlines, so jobs are never compared
+        self.due = []  # Playing popped by erase(), for draw() to draw
+
+    def schedule(self, t, job):
+        heapq.heappush(self.heap, (t, next(self.seq), job))
 
     def trigger(self, name, *args, **kwargs):
-        self.active.append((time.time(), self.library[name], args, kwargs))
+        p = Playing(time.time(), self.library[name], args, kwargs)
+        self.active[p] = None
+        self.schedule(p.startt, p)
+
+    def tick(self, startt, interval, now=None):
+        'Wake up every *interval* seconds from *startt*, with nothing to draw.  Return the Tick.'
+        t = Tick(startt, interval)
+        self.schedule(t.after(time.time() if now is None else now), t)
+        return t
 
     def load(self, name, fp):
         self.library[name] = Animation(fp)
 
-    def draw(self, scr, now):
-        'Draw all active animations on *scr* at time *t*.  Return next t to be called at.'
-        times = []
-        done = []
-        for row in self.active:
-            startt, anim, args, kwargs = row
-            nextt = anim.draw(scr, now-startt, *args, **kwargs)
-            if nextt is None:
-                done.append(row)
+    def load_file(self, name, fn):
+        self.library[name] = load_animation(fn)
+
+    def deadline(self):
+        'Return the time the next frame or tick is due, or None if nothing is scheduled.'
+        return self.heap[0][0] if self.heap else None
+
+    def erase(self, scr, now):
+        '''Pop the frames and ticks due at *now*, and erase from *scr* what
+        the due animations drew.  Return the erased [(y, x, width)], so the
+        caller can redraw what was under them.'''
+        erased = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            t, _, job = heapq.heappop(heap)
+            if isinstance(job, Tick):
+                self.schedule(job.after(now), job)
+                continue
+            for y, x, n in job.spans:
+                scr.addstr(y, x, ' '*n, 0)
+            erased.extend(job.spans)
+            job.spans = []
+            self.due.append(job)
+        return erased
+
+    def draw(self, scr, now, redraw=False):
+        '''Draw the current frames of the animations erase() found due, or of
+        all active animations if *redraw* (after the screen was repainted).
+        Return the time the next frame or tick is due, or None.'''
+        due, self.due = self.due, []
+        for p in (self.active if redraw else due):
+            p.spans = []
+            p.nextt = p.anim.draw(scr, now-p.startt, *p.args, spans=p.spans, **p.kwargs)
+        for p in due:
+            if p.nextt is None:
+                del self.active[p]
             else:
-                times.append(startt+nextt)
-        for row in done:
-            self.active.remove(row)
-        return min(times) if times else now
+                self.schedule(p.startt+p.nextt, p)
+        return self.deadline()
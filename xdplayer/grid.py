@@ -0,0 +1,140 @@
+'''
+Compact crossword grid storage.
+
+Cells are kept row-major in one flat bytearray, one latin-1 byte per cell, so
+cell (y, x) lives at index y*ncols+x.  Values that do not fit in a byte (rebus
+words, or characters outside latin-1) are stored as REBUS in the bytearray and
+looked up in a side table.
+'''
+
+REBUS = 0  # byte value for cells whose contents are in Grid.rebus
+CHARS = [chr(i) for i in range(256)]
+
+# bytes.translate table to clear a grid: blocks stay, everything else becomes '.'
+CLEAR_TABLE = bytes(ord('#') if i == ord('#') else ord('.') for i in range(256))
+
+
+class GridRow:
+    'Read/write view of one row of a Grid, so grid[y][x] keeps working.'
+    __slots__ = ('grid', 'y')
+
+    def __init__(self, grid, y):
+        self.grid = grid
+        self.y = y
+
+    def __len__(self):
+        return self.grid.ncols
+
+    def _index(self, x):
+        if x < 0:
+            x += self.grid.ncols
+        if not 0 <= x < self.grid.ncols:
+            raise IndexError('grid column out of range')
+        return x
+
+    def __getitem__(self, x):
+        return self.grid.get(self.y, self._index(x))
+
+    def __setitem__(self, x, ch):
+        self.grid.set(self.y, self._index(x), ch)
+
+    def __iter__(self):
+        g = self.grid
+        i = self.y*g.ncols
+        for j in range(i, i+g.ncols):
+            b = g.cells[j]
+            yield g.rebus[j] if b == REBUS else CHARS[b]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class Grid:
+    __slots__ = ('nrows', 'ncols', 'cells', 'rebus')
+
+    def __init__(self, rows=(), blockch='#'):
+        'Build from a sequence of rows, each a string or a sequence of cell strings.  Short rows are padded with *blockch*.'
+        rows = list(rows)
+        self.nrows = len(rows)
+        self.ncols = len(rows[0]) if rows else 0
+        self.cells = bytearray(ord(blockch) for i in range(self.nrows*self.ncols))
+        self.rebus = {}  # index into cells -> str
+        for y, row in enumerate(rows):
+            for x, ch in enumerate(row[:self.ncols]):
+                self.set(y, x, ch)
+
+    @classmethod
+    def frombytes(cls, nrows, ncols, cells, rebus=()):
+        g = cls.__new__(cls)
+        g.nrows = nrows
+        g.ncols = ncols
+        g.cells = bytearray(cells)
+        g.rebus = dict(rebus)
+        return g
+
+    def copy(self):
+        return Grid.frombytes(self.nrows, self.ncols, self.cells, self.rebus)
+
+    def cleared(self):
+        'Return a new grid with blocks kept and every other cell unfilled.'
+        return Grid.frombytes(self.nrows, self.ncols, self.cells.translate(CLEAR_TABLE))
+
+    def get(self, y, x):
+        'Return the cell at (y, x), which must be in range.'
+        i = y*self.ncols + x
+        b = self.cells[i]
+        return self.rebus[i] if b == REBUS else CHARS[b]
+
+    def cell(self, y, x, default='#'):
+        'Return the cell at (y, x), or *default* if outside the grid.'
+        if y < 0 or x < 0 or y >= self.nrows or x >= self.ncols:
+            return default
+        i = y*self.ncols + x
+        b = self.cells[i]
+        return self.rebus[i] if b == REBUS else CHARS[b]
+
+    def set(self, y, x, ch):
+        i = y*self.ncols + x
+        if len(ch) == 1 and 0 < ord(ch) < 256:
+            self.cells[i] = ord(ch)
+            if self.rebus:
+                self.rebus.pop(i, None)
+        else:
+            self.cells[i] = REBUS
+            self.rebus[i] = ch
+
+    def lines(self):
+        'Return the rows as latin-1 strings, with NUL for rebus cells.'
+        n = self.ncols
+        return [self.cells[i:i+n].decode('latin-1') for i in range(0, self.nrows*n, n)]
+
+    def chars(self):
+        'Generate every cell in row-major order.'
+        rebus = self.rebus
+        for i, b in enumerate(self.cells):
+            yield rebus[i] if b == REBUS else CHARS[b]
+
+    def __len__(self):
+        return self.nrows
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.nrows
+        if not 0 <= y < self.nrows:
+            raise IndexError('grid row out of range')
+        return GridRow(self, y)
+
+    def __iter__(self):
+        for y in range(self.nrows):
+            yield GridRow(self, y)
+
+    def __eq__(self, other):
+        if isinstance(other, Grid):
+            return (self.nrows, self.ncols, self.cells, self.rebus) == (other.nrows, other.ncols, other.cells, other.rebus)
+        return [list(r) for r in self] == [list(r) for r in other]
+
+    def __repr__(self):
+        return 'Grid(%r)' % [''.join(r) for r in self]
@@ -0,0 +1,281 @@
+'''
+Shared guesses log ($TEAMDIR/<xdid>.xd-guesses.jsonl) support.
+
+Every player of a puzzle appends JSON rows to the same log and replays
+everyone else's rows from it.
+'''
+
+from contextlib import contextmanager
+import errno
+import json
+import os
+import stat
+import struct
+import sys
+import time
+
+from .atomicfile import atomic_write
+
+WRITABLE = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len; followed by len bytes of name
+STAT_INTERVAL = 1.0  # seconds between stat checks when inotify is watching too
+
+
+def fsync_policy(policy):
+    'Return "never", "always" or a number of seconds for the fsync *policy*; anything else is "never".'
+    policy = str(policy).strip()
+    if policy in ('never', 'always'):
+        return policy
+    try:
+        secs = float(policy)
+    except ValueError:
+        return 'never'
+    return secs if secs >= 0 else 'never'  # also rejects nan
+
+
+class GuessLog:
+    '''Long-lived append-only writer for a guesses log.
+
+    The file is opened once with O_APPEND, and each flush is a single
+    os.write of whole lines, so rows from several players never interleave.
+    Rows written inside batch() are coalesced into one write.
+
+    *fsync* is the durability policy: "never" (leave it to the OS), "always"
+    (after every flush), or a number of seconds between fsyncs.  It defaults
+    to $XDFSYNC, or "never", which is also used for invalid values.  Rows
+    written within the interval are synced by sync_if_due() or close().
+    '''
+    def __init__(self, fn, fsync=None):
+        self.fn = fn
+        self.fd = None
+        self.pending = []  # encoded rows not yet written
+        self.batching = 0  # nesting depth of batch()
+        self.fsync = fsync_policy(os.getenv('XDFSYNC', 'never') if fsync is None else fsync)
+        self.lastsync = 0
+        self.unsynced = False  # rows were written since the last fsync
+
+    def write(self, *rows):
+        self.check_writable()  # even when batching, so the caller does not apply a guess that cannot be logged
+        self.pending.extend(json.dumps(r) + '\n' for r in rows)
+        if not self.batching:
+            self.flush()
+
+    @contextmanager
+    def batch(self):
+        'Coalesce all rows written within this context into one write at the end.'
+        self.batching += 1
+        try:
+            yield self
+        finally:
+            self.batching -= 1
+            if not self.batching:
+                self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        data = ''.join(self.pending).encode('utf-8')
+        self.pending.clear()
+
+        self.check_writable()
+
+        while data:
+            data = data[os.write(self.fd, data):]
+
+        if self.fsync == 'always':
+            os.fsync(self.fd)
+        elif self.fsync != 'never':
+            self.unsynced = True
+            self.sync_if_due()
+
+    def sync_if_due(self, now=None):
+        'fsync the rows written since the last fsync, if the interval policy says it is time.'
+        if self.unsynced and self.fd is not None:
+            now = time.time() if now is None else now
+            if now - self.lastsync >= self.fsync:
+                os.fsync(self.fd)
+                self.lastsync = now
+                self.unsynced = False
+
+    def check_writable(self):
+        'Open the log if needed, and raise PermissionError if it is read-only.'
+        if self.fd is None:
+            self.fd = os.open(self.fn, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+
+        # the log is chmod'ed read-only when the puzzle is submitted, possibly by another player
+        if not os.fstat(self.fd).st_mode & WRITABLE:
+            raise PermissionError(errno.EACCES, 'guesses file is read-only', str(self.fn))
+
+    def close(self):
+        try:
+            self.flush()
+            if self.unsynced and self.fd is not None:
+                os.fsync(self.fd)
+                self.unsynced = False
+        finally:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_TAIL = 64  # bytes of the log before the checkpoint offset, to detect a rewritten log
+
+
+def checkpoint_fn(guessfn):
+    return str(guessfn) + '.ckpt'
+
+
+def read_checkpoint(guessfn):
+    'Return the checkpoint dict for *guessfn*, or None if there is none or it no longer matches the log.'
+    try:
+        with open(checkpoint_fn(guessfn), encoding='utf-8') as fp:
+            ckpt = json.load(fp)
+        if ckpt.get('version') != CHECKPOINT_VERSION:
+            return None
+        offset = ckpt['offset']
+        tail = ckpt['tail'].encode('latin-1')
+        with open(guessfn, 'rb') as fp:
+            fp.seek(offset - len(tail))
+            if fp.read(len(tail)) != tail:
+                return None
+        return ckpt
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def write_checkpoint(guessfn, ckpt):
+    'Atomically replace the checkpoint for *guessfn* with *ckpt*, a dict with at least an "offset" into the log.  Failures are ignored.'
+    try:
+        offset = ckpt['offset']
+        with open(guessfn, 'rb') as fp:
+            fp.seek(max(0, offset-CHECKPOINT_TAIL))
+            tail = fp.read(offset - max(0, offset-CHECKPOINT_TAIL))
+
+        with atomic_write(checkpoint_fn(guessfn), 'w', encoding='utf-8') as fp:
+            json.dump(dict(ckpt, version=CHECKPOINT_VERSION, tail=tail.decode('latin-1')), fp)
+    except OSError:
+        pass
+
+
+def compact(rows):
+    '''Return the subset of *rows* that replays to the same puzzle state.
+
+    Keeps every note, the last row for each cell (so per-cell last-writer
+    attribution survives), the first row of each solver (so solver colors
+    are assigned in the same order), and every row that writes or overwrites
+    a rebus (as each new rebus takes the lowest symbol free at the time), in
+    their original order.
+    '''
+    keep = set()
+    lastrow = {}  # (x, y) -> index of the last row for that cell
+    lastch = {}  # (x, y) -> ch of the last row for that cell
+    users = set()
+    for i, r in enumerate(rows):
+        if 'note' in r:
+            keep.add(i)
+            continue
+        xy = (r['x'], r['y'])
+        if len(r['ch']) > 1 or len(lastch.get(xy, '')) > 1:
+            keep.add(i)
+        lastrow[xy] = i
+        lastch[xy] = r['ch']
+        user = r.get('user', '')
+        if user not in users:
+            users.add(user)
+            keep.add(i)
+
+    keep.update(lastrow.values())
+    return [rows[i] for i in sorted(keep)]
+
+def inotify_watch(path, mask):
+    'Return a non-blocking inotify fd watching *path* for *mask* events, or None if inotify is not available.'
+    if not sys.platform.startswith('linux'):
+        return None
+    import ctypes
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class LogWatcher:
+    '''Cheaply tell whether a file may have changed since the last check.
+
+    Uses inotify on its directory where available (so the file may not exist
+    yet, or be replaced); otherwise compares the stat size and mtime on every
+    check.  inotify does not see writes from other hosts of a network
+    filesystem, so with inotify the stat is still compared, at most every
+    STAT_INTERVAL seconds.  Set $XDWATCH=stat to not use inotify.
+    '''
+    def __init__(self, fn):
+        self.fn = os.fspath(fn)
+        self.name = os.fsencode(os.path.basename(self.fn))
+        self.laststat = None
+        self.nextstat = 0  # time.monotonic() of the next stat check, when inotify is watching
+        self.fd = None
+        if os.getenv('XDWATCH') != 'stat':
+            self.fd = inotify_watch(os.path.dirname(self.fn) or '.', IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        self.pending = True  # report a change on the first check
+
+    def fileno(self):
+        'Return the fd that becomes readable on changes, or None if changes must be polled.'
+        return self.fd
+
+    def stat_changed(self):
+        'Return True if the stat of the file differs from the last call.'
+        try:
+            st = os.stat(self.fn)
+            key = (st.st_size, st.st_mtime_ns, st.st_ino)
+        except FileNotFoundError:
+            key = None
+        changed = key != self.laststat
+        self.laststat = key
+        return changed
+
+    def changed(self):
+        'Return True if the file may have changed since the last call.'
+        if self.fd is None:
+            return self.stat_changed()
+
+        changed, self.pending = self.pending, False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            i = 0
+            while i < len(data):
+                wd, mask, cookie, namelen = INOTIFY_EVENT.unpack_from(data, i)
+                i += INOTIFY_EVENT.size
+                if mask & IN_Q_OVERFLOW or data[i:i+namelen].rstrip(b'\0') == self.name:
+                    changed = True
+                i += namelen
+
+        now = time.monotonic()
+        if changed or now >= self.nextstat:
+            self.nextstat = now + STAT_INTERVAL
+            changed = self.stat_changed() or changed  # also keeps laststat current for the next check
+        return changed
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,120 @@
+'''
+In-memory stand-in for a curses window, to run the real drawing code in
+tests and benchmarks without a terminal.
+'''
+
+import curses
+import unicodedata
+
+
+class HeadlessColors:
+    'Hands out a distinct color pair attr for each color string, like ColorMaker but without curses.'
+    def __init__(self):
+        self.attrs = {}
+        self.warn = lambda s: None
+
+    def __getitem__(self, colornamestr):
+        try:
+            return self.attrs[colornamestr]
+        except KeyError:
+            attr = self.attrs[colornamestr] = (len(self.attrs)+1) % 256 << 8  # like curses.color_pair(n)
+            return attr
+
+    def to_name(self, attr):
+        for k, v in self.attrs.items():
+            if v == attr:
+                return k
+        return 'unknown'
+
+
+class HeadlessScreen:
+    '''Keeps what would be on the screen as a (char, attr) per cell.
+
+    Implements the window methods the player uses.  Like curses, addstr
+    wraps at the right edge, raises curses.error when it starts off-screen
+    or runs past the bottom right corner, and combines the attr with the
+    background set by bkgd().  Wide characters take two cells; the second
+    holds ''.  getkeystroke() returns the queued *keys*, then ''.
+    '''
+    def __init__(self, h=25, w=80, keys=()):
+        self.h, self.w = h, w
+        self.colors = HeadlessColors()
+        self.keys = list(keys)
+        self.bkgdch, self.bkgdattr = ' ', 0
+        self.nwrites = 0  # number of addstr calls
+        self.erase()
+
+    def getmaxyx(self):
+        return self.h, self.w
+
+    def resize(self, h, w):
+        'Change the screen size, as if the terminal was resized, and queue KEY_RESIZE.'
+        self.h, self.w = h, w
+        self.erase()
+        self.keys.append('KEY_RESIZE')
+
+    def erase(self):
+        self.cells = [[(self.bkgdch, self.bkgdattr)]*self.w for y in range(self.h)]
+
+    clear = erase
+
+    def bkgd(self, ch, attr=0):
+        'Set the background, and like ncurses apply it to what is already on screen.'
+        oldch, old = self.bkgdch, self.bkgdattr
+        self.bkgdch, self.bkgdattr = ch, attr
+        for row in self.cells:
+            for x, (c, a) in enumerate(row):
+                if a & curses.A_COLOR == old & curses.A_COLOR:
+                    a &= ~curses.A_COLOR
+                a &= ~(old & ~curses.A_COLOR)
+                row[x] = (ch if c == oldch else c, self.combine(a))
+
+    def combine(self, attr):
+        'Return *attr* as drawn: the background adds its attrs, and its color if *attr* has none.'
+        bk = self.bkgdattr
+        return (attr | bk) & ~curses.A_COLOR | (attr & curses.A_COLOR or bk & curses.A_COLOR)
+
+    def addstr(self, y, x, s, attr=0):
+        if not (0 <= y < self.h and 0 <= x < self.w):
+            raise curses.error('addstr() returned ERR')
+        self.nwrites += 1
+
+        attr = self.combine(attr)
+        for ch in s:
+            chw = 2 if unicodedata.east_asian_width(ch) in 'WF' else 1
+            if x+chw > self.w:
+                y, x = y+1, 0
+            if y >= self.h:
+                raise curses.error('addstr() returned ERR')
+            row = self.cells[y]
+            row[x] = (ch, attr)
+            if chw == 2:
+                row[x+1] = ('', attr)
+            x += chw
+            if x >= self.w:
+                if y == self.h-1:
+                    raise curses.error('addstr() returned ERR')  # the cursor cannot move past the corner
+                y, x = y+1, 0
+
+    def move(self, y, x):
+        pass
+
+    def refresh(self):
+        pass
+
+    def timeout(self, ms):
+        pass
+
+    def getkeystroke(self):
+        return self.keys.pop(0) if self.keys else ''
+
+    def snapshot(self):
+        'Return a copy of the screen contents.'
+        return [list(row) for row in self.cells]
+
+    def line(self, y):
+        'Return the text on screen row *y*.'
+        return ''.join(ch for ch, attr in self.cells[y])
+
+    def __str__(self):
+        return '\n'.join(self.line(y) for y in range(self.h))
@@ -0,0 +1,43 @@
+from collections import namedtuple
+
+Word = namedtuple('Word', 'dir num r c length')
+
+
+def number_grid(rows, blocks='#'):
+    '''Return a Word for each across and down answer in *rows*, in clue order.
+
+    *rows* is a sequence of equal-length rows (strings or lists of cells); any
+    cell in *blocks* is a block.  A word is a run of two or more non-block
+    cells, and words are numbered like a printed grid: left to right, top to
+    bottom, across before down in the same cell.
+    '''
+    nrows = len(rows)
+    ncols = len(rows[0]) if nrows else 0
+
+    # length of the open run starting at each cell, going right and going down.
+    # one extra row and column of zeros on the end also serve as the row/column at -1.
+    acrlen = [[0]*(ncols+1) for r in range(nrows+1)]
+    downlen = [[0]*(ncols+1) for r in range(nrows+1)]
+    for r in range(nrows-1, -1, -1):
+        row = rows[r]
+        acr, down, below = acrlen[r], downlen[r], downlen[r+1]
+        for c in range(ncols-1, -1, -1):
+            if row[c] not in blocks:
+                acr[c] = acr[c+1] + 1
+                down[c] = below[c] + 1
+
+    words = []
+    num = 0
+    for r in range(nrows):
+        acr, down, above = acrlen[r], downlen[r], downlen[r-1]
+        for c in range(ncols):
+            a = acr[c] if not acr[c-1] else 0     # across starts after a block or the left edge
+            d = down[c] if not above[c] else 0    # down starts below a block or the top edge
+            if a > 1 or d > 1:
+                num += 1
+                if a > 1:
+                    words.append(Word('A', num, r, c, a))
+                if d > 1:
+                    words.append(Word('D', num, r, c, d))
+
+    return words
@@ -1,6 +1,6 @@
-﻿import functools
-import operator
-import math
+﻿import math
+import mmap
+import os
 import string
 import struct
 import sys
@@ -42,6 +42,10 @@ ACROSSDOWN = 'ACROSS&DOWN'
 
 BLACKSQUARE = '.'
 
+# read() memory-maps files at least this big, rather than reading them into
+# memory; for smaller files the mmap costs more than the copy it saves
+MMAP_MIN_SIZE = 1 << 16
+
 
 def enum(**enums):
     return type('Enum', (), enums)
@@ -101,12 +105,20 @@ def read(filename):
     throws PuzzleFormatError if there's any problem with the file format.
     """
     with open(filename, 'rb') as f:
-        return load(f.read())
+        size = os.fstat(f.fileno()).st_size
+        if not size or size < MMAP_MIN_SIZE:  # an empty file cannot be mapped
+            return load(f.read())
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return load(data)
+        finally:
+            data.close()
 
 
 def load(data):
     """
-    Read .puz file data and return the Puzzle object.
+    Read .puz file data (bytes, bytearray or mmap) and return
+    the Puzzle object.  The Puzzle does not refer to *data* afterwards.
     throws PuzzleFormatError if there's any problem with the file format.
     """
     puz = Puzzle()
@@ -155,6 +167,12 @@ class Puzzle:
 
     def load(self, data):
         s = PuzzleBuffer(data)
+        try:
+            self.load_from(s)
+        finally:
+            s.release()  # so an mmap under it can be closed
+
+    def load_from(self, s):
 
         # advance to start - files may contain some data before the
         # start of the puzzle use the ACROSS&DOWN magic string as a waypoint
@@ -164,7 +182,7 @@ class Puzzle:
                                     "puzzle. Are you sure you didn't intend "
                                     "to use read?")
 
-        self.preamble = s.data[:s.pos]
+        self.preamble = bytes(s.view[:s.pos])
 
         puzzle_data = s.unpack(HEADER_FORMAT)
         cksum_gbl = puzzle_data[0]
@@ -183,8 +201,8 @@ class Puzzle:
         self.solution_state = puzzle_data[12]
 
         self.version = self.fileversion[:3]
-        self.solution = s.read(self.width * self.height).decode(ENCODING)
-        self.fill = s.read(self.width * self.height).decode(ENCODING)
+        self.solution = str(s.read(self.width * self.height), ENCODING)
+        self.fill = str(s.read(self.width * self.height), ENCODING)
 
         self.title = s.read_string()
         self.author = s.read_string()
@@ -199,7 +217,7 @@ class Puzzle:
             ext_cksum[code] = cksum
             # extension data is represented as a null-terminated string,
             # but since the data can contain nulls we can't use read_string
-            self.extensions[code] = s.read(length)
+            self.extensions[code] = bytes(s.read(length))
             s.read(1)  # extensions have a trailing byte
             # save the codes in order for round-tripping
             self._extensions_order.append(code)
@@ -207,7 +225,7 @@ class Puzzle:
         # sometimes there's some extra garbage at
         # the end of the file, usually \r\n
         if s.can_read():
-            self.postscript = s.read_to_end()
+            self.postscript = bytes(s.read_to_end())
 
         if cksum_gbl != self.global_cksum():
             raise PuzzleFormatError('global checksum does not match')
@@ -393,13 +411,24 @@ class Puzzle:
 
 class PuzzleBuffer:
     """PuzzleBuffer class
-    wraps a data buffer ('' or []) and provides .puz-specific methods for
-    reading and writing data
+    wraps a data buffer (bytes-like, to read) or a list of chunks (to write)
+    and provides .puz-specific methods for reading and writing data.
+    Reads return memoryview slices of the data, not copies; call release()
+    when done reading.
     """
     def __init__(self, data=None):
-        self.data = data or []
+        if data is None:
+            self.data = []
+            self.view = None
+        else:
+            self.data = data
+            self.view = memoryview(data)
         self.pos = 0
 
+    def release(self):
+        if self.view is not None:
+            self.view.release()
+
     def can_read(self, n_bytes=1):
         return self.pos + n_bytes <= len(self.data)
 
@@ -409,12 +438,12 @@ class PuzzleBuffer:
     def read(self, n_bytes):
         start = self.pos
         self.pos += n_bytes
-        return self.data[start:self.pos]
+        return self.view[start:self.pos]
 
     def read_to_end(self):
         start = self.pos
         self.pos = self.length()
-        return self.data[start:self.pos]
+        return self.view[start:self.pos]
 
     def read_string(self):
         return self.read_until(b'\0')
@@ -422,16 +451,16 @@ class PuzzleBuffer:
     def read_until(self, c):
         start = self.pos
         self.seek_to(c, 1)  # read past
-        return str(self.data[start:self.pos-1], ENCODING)
+        return str(self.view[start:self.pos-1], ENCODING)
 
     def seek_to(self, s, offset=0):
-        try:
-            self.pos = self.data.index(s, self.pos) + offset
-            return True
-        except ValueError:
+        i = self.data.find(s, self.pos)
+        if i < 0:
             # s not found, advance to end
             self.pos = self.length()
             return False
+        self.pos = i + offset
+        return True
 
     def write(self, s):
         self.data.append(s)
@@ -449,7 +478,7 @@ class PuzzleBuffer:
     def unpack(self, struct_format):
         start = self.pos
         try:
-            res = struct.unpack_from(struct_format, self.data, self.pos)
+            res = struct.unpack_from(struct_format, self.view, self.pos)
             self.pos += struct.calcsize(struct_format)
             return res
         except struct.error:
@@ -596,20 +625,23 @@ class Markup:
 
 
 # helper functions for cksums and scrambling
+
+# CKSUM_ROTR[c] is the low 16 bits of c right-shifted one with wrap-around.
+# It covers c up to 0xffff+0xff, so the running sum need not be masked
+# between bytes.
+CKSUM_ROTR = [(c & 0xfffe) >> 1 | (c & 1) << 15 for c in range(0x10000 + 0x100)]
+
+
 def data_cksum(data, cksum=0):
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        data = [ord(b) if isinstance(b, bytes) else b for b in data]
+    rotr = CKSUM_ROTR
     for b in data:
-        if isinstance(b, bytes):
-            b = ord(b)
-        # right-shift one with wrap-around
-        lowbit = (cksum & 0x0001)
-        cksum = (cksum >> 1)
-        if lowbit:
-            cksum = (cksum | 0x8000)
-
-        # then add in the data and clear any carried bit past 16
-        cksum = (cksum + b) & 0xffff
+        # right-shift one with wrap-around, then add in the data
+        cksum = rotr[cksum] + b
 
-    return cksum
+    # clear any carried bit past 16
+    return cksum & 0xffff
 
 
 def scramble_solution(solution, width, height, key):
@@ -674,12 +706,21 @@ def square(data, w, h):
     )
 
 
+ATOZ = string.ascii_uppercase
+# SHIFT_TABLES[k] translates each letter k letters further along the alphabet
+SHIFT_TABLES = [str.maketrans(ATOZ, ATOZ[k:] + ATOZ[:k]) for k in range(26)]
+NOT_ATOZ = str.maketrans('', '', ATOZ)
+
+
 def shift(s, key):
-    atoz = string.ascii_uppercase
-    return ''.join(
-        atoz[(atoz.index(c) + key[i % len(key)]) % len(atoz)]
-        for i, c in enumerate(s)
-    )
+    if s.translate(NOT_ATOZ):
+        raise ValueError('can only shift A-Z')
+    # every len(key)th letter is shifted by the same key digit
+    n = len(key)
+    shifted = [''] * len(s)
+    for i, k in enumerate(key):
+        shifted[i::n] = s[i::n].translate(SHIFT_TABLES[k % 26])
+    return ''.join(shifted)
 
 
 def unshift(s, key):
@@ -687,8 +728,11 @@ def unshift(s, key):
 
 
 def shuffle(s):
-    mid = int(math.floor(len(s) / 2))
-    items = functools.reduce(operator.add, zip(s[mid:], s[:mid]))
+    # interleave the second half with the first: s[mid], s[0], s[mid+1], s[1], ...
+    mid = len(s) // 2
+    items = [''] * (2*mid)
+    items[::2] = s[mid:2*mid]
+    items[1::2] = s[:mid]
     return ''.join(items) + (s[-1] if len(s) % 2 else '')
 
 
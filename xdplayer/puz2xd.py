@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 
+import os
 import sys
-from .puz import read as puz_read
+from .puz import read as puz_read, PuzzleFormatError
+from .atomicfile import atomic_write
+from .numbering import number_grid
 
 BLOCK = '#'
 
 def gen_xd(puzfn, clear=True):
     p = puz_read(puzfn)
+    if not clear and p.is_solution_locked():
+        raise PuzzleFormatError('solution is locked')
 
     yield 'Title: ' + p.title.strip()
     yield 'Author: ' + p.author.strip()
@@ -26,24 +31,12 @@ def gen_xd(puzfn, clear=True):
     yield ''
     yield ''
 
-    def is_block(x, y):
-         return x < 0 or y < 0 or x >= p.width or y >= p.height or grid[y][x] in BLOCK
-
-    i = 0   # index into p.clues
-    n = 0   # printed clue number
-    for y, row in enumerate(grid):
-        for x, cell in enumerate(row):
-            start_across = is_block(x-1, y) and not is_block(x, y) and not is_block(x+1, y)
-            start_down = is_block(x, y-1) and not is_block(x, y) and not is_block(x, y+1)
-
-            if start_across or start_down:
-                n += 1
-            if start_across:
-                across[n] = p.clues[i]
-                i += 1
-            if start_down:
-                down[n] = p.clues[i]
-                i += 1
+    # p.clues are in clue order
+    for i, (dir, n, y, x, length) in enumerate(number_grid(grid, BLOCK)):
+        if dir == 'A':
+            across[n] = p.clues[i]
+        else:
+            down[n] = p.clues[i]
 
     for k, v in across.items():
         yield f'A{k}. {v}'
@@ -54,6 +47,20 @@ def gen_xd(puzfn, clear=True):
         yield f'D{k}. {v}'
 
 
+def xd_path(puzfn):
+    'Return the path of the .xd that convert() writes for *puzfn* by default.'
+    return os.path.splitext(puzfn)[0] + '.xd'
+
+
+def convert(puzfn, xdfn=None, clear=False):
+    'Write the .puz *puzfn* as a .xd to *xdfn* (default: alongside it), replacing it atomically.  Return *xdfn*.'
+    xdfn = xdfn or xd_path(puzfn)
+    contents = '\n'.join(gen_xd(puzfn, clear=clear)) + '\n'
+    with atomic_write(xdfn, 'w', encoding='utf-8') as fp:
+        fp.write(contents)
+    return xdfn
+
+
 if __name__ == '__main__':
     for line in gen_xd(sys.argv[1], clear=True):
         print(line)
@@ -1,4 +1,3 @@
-import functools
 import curses
 
 def getkeystroke(scr):
@@ -15,35 +14,50 @@ def getkeystroke(scr):
     return curses.keyname(k).decode('utf-8')
 
 class ColorMaker:
-    def __init__(self, scr):
-        self.attrs = {}
-        self.color_attrs = {}
+    pairs_low = 8  # warn when this few color pairs are left
+
+    def __init__(self, scr, warn=lambda s: None):
+        self.attrs = {}  # colornamestr -> curses attr
+        self.color_attrs = {}  # (fg, bg) -> curses color pair attr
+        self.color_names = {}  # curses color pair attr -> (fg, bg)
         self.scr = scr
+        self.warn = warn  # called with a message when color pairs run low
+        self.exhausted = False
 
 
     def get_color(self, fg, bg):
         if not self.color_attrs:
             self.color_attrs[''] = curses.color_pair(0)
+            self.color_names[curses.color_pair(0)] = ''
 
         if not self.color_attrs.get((fg,bg), None):
+            c = len(self.color_attrs)
+            npairs = getattr(curses, 'COLOR_PAIRS', 256)
+            if c >= npairs:
+                if not self.exhausted:
+                    self.exhausted = True
+                    self.warn(f'out of color pairs ({npairs}); using default colors for the rest')
+                return self.color_attrs['']
+            if c == npairs-self.pairs_low:
+                self.warn(f'only {self.pairs_low} of {npairs} color pairs left')
             try:
-                c = len(self.color_attrs)
                 curses.init_pair(c, fg, bg)
                 self.color_attrs[(fg,bg)] = curses.color_pair(c)
+                self.color_names[curses.color_pair(c)] = (fg,bg)
             except curses.error as e:
-                pass # curses.init_pair gives a curses error on Windows
+                return self.color_attrs['']  # curses.init_pair gives a curses error on Windows
         return self.color_attrs[(fg,bg)]
 
     def __getitem__(self, colornamestr):
-        return self._colornames_to_cattr(colornamestr)
+        try:
+            return self.attrs[colornamestr]
+        except KeyError:
+            attr = self.attrs[colornamestr] = self._colornames_to_cattr(colornamestr)
+            return attr
 
     def to_name(self, attr):
-        for k, v in self.color_attrs.items():
-            if v == attr:
-                return k
-        return 'unknown'
+        return self.color_names.get(attr, 'unknown')
 
-    @functools.lru_cache
     def _colornames_to_cattr(self, colornamestr):
         if not colornamestr:
             return 0
@@ -63,7 +77,12 @@ class ColorMaker:
 
 
 class OptionsObject(dict):
-    'Augment a dict with more convenient .attr syntax.  not-present keys return None.'
+    '''Augment a dict with more convenient .attr syntax.  not-present keys return None.
+
+    Values are resolved once (options ending in "attr" into curses attrs, via
+    .scr.colors) and kept in the instance dict, so later lookups do not reach
+    __getattr__.  *cache* holds other values derived from the options.  Both
+    are cleared when an option or .scr changes.'''
     def __init__(self, **kwargs):
         kw = {}
         for k, v in kwargs.items():
@@ -83,19 +102,45 @@ class OptionsObject(dict):
             assert isinstance(v, list)
             kw[k] = v
         dict.__init__(self, **kw)
+        object.__setattr__(self, 'cache', {})
+        object.__setattr__(self, 'resolved', set())  # names __getattr__ cached in __dict__
 
     def __getattr__(self, k):
         try:
             v = self[k][0]
-            if k.endswith('attr') and getattr(self, 'scr', None):
-                v = self.scr.colors[v]
-            return v
         except KeyError as e:
             if k.startswith("__"):
                 raise AttributeError
 
             return 0
 
+        scr = self.__dict__.get('scr')
+        if k.endswith('attr') and scr:
+            v = scr.colors[v]
+        self.__dict__[k] = v
+        self.resolved.add(k)
+        return v
+
+    def __setattr__(self, k, v):
+        object.__setattr__(self, k, v)
+        self.resolved.discard(k)  # set explicitly, so keep it
+        self.invalidate()
+
+    def __delattr__(self, k):
+        object.__delattr__(self, k)
+        self.invalidate()
+
+    def __setitem__(self, k, v):
+        dict.__setitem__(self, k, v)
+        self.invalidate()
+
+    def invalidate(self):
+        'Forget resolved and derived values.'
+        for k in self.resolved:
+            self.__dict__.pop(k, None)
+        self.resolved.clear()
+        self.cache.clear()
+
     def __dir__(self):
         return self.keys()
 
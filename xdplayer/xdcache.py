@@ -0,0 +1,120 @@
+'''
+Compiled puzzle cache.
+
+Parsed puzzles are stored in $XDCACHE (default ~/.cache/xdplayer) as marshalled
+tuples, keyed by the absolute source path.  An entry is only used if the
+source file still has the mtime and size it had when the entry was written,
+and the cache version matches; anything else is treated as a miss and
+rewritten.  Least recently used entries are removed when the cache grows past
+$XDCACHE_SIZE bytes; to avoid listing the cache on every save, each process
+keeps a running total of its size, so growth from other processes is only
+noticed by their own totals or the next process's first save.  Set XDCACHE to
+the empty string to disable the cache.
+'''
+
+import hashlib
+import marshal
+import os
+import struct
+from pathlib import Path
+
+from .atomicfile import atomic_write
+
+CACHE_VERSION = 3   # bump whenever the compiled layout in Crossword.compile changes
+MAGIC = b'XDC'
+HEADER = struct.Struct('<3sBqq')  # magic, version, source mtime_ns, source size
+
+default_maxsize = 32*1024*1024
+cache_totals = {}  # cache dir -> bytes in it as of the last prune, plus what this process saved since
+
+
+def cachedir():
+    d = os.getenv('XDCACHE')
+    if d is None:
+        return Path(os.getenv('XDG_CACHE_HOME') or Path.home()/'.cache')/'xdplayer'
+    return Path(d) if d else None
+
+
+def cachefn(d, srcfn):
+    key = hashlib.sha1(str(Path(srcfn).absolute()).encode('utf-8')).hexdigest()
+    return d/(key+'.xdc')
+
+
+def sourcekey(srcfn):
+    'Return (mtime_ns, size) of *srcfn*, to be passed to load() and save().'
+    st = os.stat(srcfn)
+    return st.st_mtime_ns, st.st_size
+
+
+def load(srcfn, key):
+    'Return the compiled data for *srcfn* if cached under *key*, else None.'
+    d = cachedir()
+    if not d:
+        return None
+
+    fn = cachefn(d, srcfn)
+    try:
+        with open(fn, 'rb') as fp:
+            data = fp.read()
+        magic, version, mtime_ns, size = HEADER.unpack_from(data)
+        if (magic, version, (mtime_ns, size)) != (MAGIC, CACHE_VERSION, key):
+            return None
+        os.utime(fn)  # mark as recently used for prune()
+        return marshal.loads(memoryview(data)[HEADER.size:])
+    except (OSError, EOFError, ValueError, TypeError, struct.error):
+        return None
+
+
+def save(srcfn, key, compiled):
+    'Store *compiled* for *srcfn* under *key*.  Failures are ignored; the cache is only an optimization.'
+    d = cachedir()
+    if not d:
+        return
+
+    fn = cachefn(d, srcfn)
+    try:
+        d.mkdir(parents=True, exist_ok=True)
+        try:
+            oldsize = fn.stat().st_size
+        except OSError:
+            oldsize = 0
+        with atomic_write(fn, 'wb') as fp:
+            fp.write(HEADER.pack(MAGIC, CACHE_VERSION, *key))
+            fp.write(marshal.dumps(compiled))
+            size = fp.tell()
+        grow(d, size-oldsize, int(os.getenv('XDCACHE_SIZE', default_maxsize)))
+    except (OSError, ValueError):
+        pass
+
+
+def grow(d, nbytes, maxsize):
+    'Add *nbytes* to the running total for *d*, and prune it if that may be past *maxsize*.'
+    total = cache_totals.get(d)
+    if total is None or total + nbytes > maxsize:
+        total = prune(d, maxsize)
+    else:
+        total += nbytes
+    cache_totals[d] = total
+
+
+def prune(d, maxsize):
+    'Remove least recently used entries in *d* until it holds at most *maxsize* bytes.  Return the bytes left.'
+    entries = []
+    total = 0
+    for fn in d.glob('*.xdc'):
+        try:
+            st = fn.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, fn))
+        total += st.st_size
+
+    for mtime, size, fn in sorted(entries):
+        if total <= maxsize:
+            break
+        try:
+            fn.unlink()
+            total -= size
+        except OSError:
+            pass
+    return total